@@ -0,0 +1,296 @@
+import os
+import sys
+import time
+import zlib
+import importlib
+from typing import Dict, List, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import FileResponse
+from starlette.staticfiles import StaticFiles
+
+# Responses smaller than this go out as they are; compression wouldn't pay for itself
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+# Server preference when the client accepts several
+COMPRESSION_ENCODINGS = [e.strip() for e in os.getenv("COMPRESSION_ENCODINGS", "zstd,br,gzip").split(",") if e.strip()]
+# Content types worth compressing; everything else (audio/mpeg, JPEG, WebP, ...) is already compressed
+COMPRESSIBLE_TYPES = (
+    "text/", "application/json", "application/x-ndjson", "application/javascript",
+    "application/xml", "image/svg+xml",
+)
+# Server-sent events must reach the client event by event, untouched
+NEVER_COMPRESS_TYPES = ("text/event-stream",)
+
+# Levels for responses compressed per request: fast, most of the size win
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "5"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+ZSTD_LEVEL = int(os.getenv("ZSTD_LEVEL", "3"))
+# Static files are compressed once, ahead of time, so they get the slowest, smallest settings
+STATIC_LEVELS = {"gzip": 9, "br": 11, "zstd": 19}
+STATIC_SUFFIXES = {"zstd": ".zst", "br": ".br", "gzip": ".gz"}
+
+
+def _optional(module: str):
+    try:
+        return importlib.import_module(module)
+    except ImportError:
+        return None
+
+brotli = _optional("brotli")
+zstandard = _optional("zstandard")
+
+
+# === ENCODERS ===
+class _Gzip:
+    def __init__(self, level: int):
+        self._obj = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31: gzip container
+
+    def compress(self, data: bytes) -> bytes:
+        # Sync flush so each streamed chunk is decodable as soon as it arrives
+        return self._obj.compress(data) + self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._obj.flush()
+
+class _Brotli:
+    def __init__(self, quality: int):
+        self._obj = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.process(data) + self._obj.flush()
+
+    def finish(self) -> bytes:
+        return self._obj.finish()
+
+class _Zstd:
+    def __init__(self, level: int):
+        self._obj = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data) + self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._obj.flush()
+
+def available_encodings() -> List[str]:
+    installed = {"gzip": True, "br": brotli is not None, "zstd": zstandard is not None}
+    return [encoding for encoding in COMPRESSION_ENCODINGS if installed.get(encoding)]
+
+def encoder(encoding: str, level: Optional[int] = None):
+    if encoding == "br":
+        return _Brotli(BROTLI_QUALITY if level is None else level)
+    if encoding == "zstd":
+        return _Zstd(ZSTD_LEVEL if level is None else level)
+    return _Gzip(GZIP_LEVEL if level is None else level)
+
+def compress(data: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    obj = encoder(encoding, level)
+    return obj.compress(data) + obj.finish()
+
+def negotiate(accept_encoding: str, offered: List[str]) -> Optional[str]:
+    """Pick the first of `offered` the client accepts (q > 0), per Accept-Encoding."""
+    accepted: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name.strip().lower()] = q
+    for encoding in offered:
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+def compressible(content_type: str) -> bool:
+    content_type = content_type.lower()
+    if content_type.startswith(NEVER_COMPRESS_TYPES):
+        return False
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+# === MIDDLEWARE ===
+class CompressionMiddleware:
+    """Compresses responses by content type and size, buffered or streamed.
+
+    Whole bodies under `minimum_size` pass through untouched. Streamed
+    bodies (NDJSON lists) are compressed chunk by chunk and flushed as
+    they go. Responses that already carry a Content-Encoding (such as
+    precompressed static files) or a non-compressible type (audio/mpeg,
+    images) are left alone.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encodings = available_encodings()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""), self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, _Responder(send, encoding, self.minimum_size).send)
+
+class _Responder:
+    def __init__(self, send, encoding: str, minimum_size: int):
+        self._send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.start = None
+        self.passthrough = False
+        self.obj = None
+
+    async def send(self, message) -> None:
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            self.passthrough = (
+                message["status"] in (204, 304)
+                or "content-encoding" in headers
+                or not compressible(headers.get("content-type", ""))
+            )
+            if self.passthrough:
+                await self._send(message)
+            else:
+                self.start = message  # Held until the first body chunk shows the size
+            return
+        if self.passthrough or message["type"] != "http.response.body":
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more = message.get("more_body", False)
+        if self.obj is None:
+            if not more and len(body) < self.minimum_size:
+                self.passthrough = True
+                await self._send(self.start)
+                await self._send(message)
+                return
+            headers = MutableHeaders(raw=self.start["headers"])
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            self.obj = encoder(self.encoding)
+            if more:
+                del headers["Content-Length"]
+            else:
+                body = self.obj.compress(body) + self.obj.finish()
+                headers["Content-Length"] = str(len(body))
+                await self._send(self.start)
+                await self._send({"type": "http.response.body", "body": body})
+                return
+            await self._send(self.start)
+
+        chunk = self.obj.compress(body)
+        if not more:
+            chunk += self.obj.finish()
+        await self._send({"type": "http.response.body", "body": chunk, "more_body": more})
+
+
+# === STATIC FILES ===
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles that serves file.ext.{zst,br,gz} when present and accepted.
+
+    The variants are produced ahead of time by `precompress_directory`.
+    """
+
+    async def get_response(self, path: str, scope):
+        response = await super().get_response(path, scope)
+        if not isinstance(response, FileResponse) or response.status_code != 200:
+            return response
+        accept = Headers(scope=scope).get("accept-encoding", "")
+        for encoding in list(STATIC_SUFFIXES):
+            variant = response.path + STATIC_SUFFIXES[encoding]
+            if negotiate(accept, [encoding]) and os.path.isfile(variant):
+                return FileResponse(
+                    variant,
+                    media_type=response.media_type,
+                    headers={"Content-Encoding": encoding, "Vary": "Accept-Encoding"}
+                )
+        if compressible(response.media_type or ""):
+            response.headers.add_vary_header("Accept-Encoding")
+        return response
+
+def precompress_directory(directory: str, minimum_size: int = COMPRESSION_MIN_SIZE) -> int:
+    """Write compressed variants next to compressible files; returns how many were written.
+
+    Variants newer than their source are kept, so reruns only touch changed files.
+    """
+    import mimetypes
+
+    encodings = [e for e in STATIC_SUFFIXES if e == "gzip" or e in available_encodings()]
+    written = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            source = os.path.join(root, name)
+            if name.endswith(tuple(STATIC_SUFFIXES.values())) or os.path.getsize(source) < minimum_size:
+                continue
+            if not compressible(mimetypes.guess_type(name)[0] or ""):
+                continue
+            data = None
+            for encoding in encodings:
+                target = source + STATIC_SUFFIXES[encoding]
+                if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(source):
+                    continue
+                if data is None:
+                    with open(source, "rb") as f:
+                        data = f.read()
+                packed = compress(data, encoding, STATIC_LEVELS[encoding])
+                if len(packed) >= len(data):
+                    continue
+                with open(target + ".tmp", "wb") as f:
+                    f.write(packed)
+                os.replace(target + ".tmp", target)
+                written += 1
+    return written
+
+
+# === BENCHMARK ===
+def _bench(count: int, rounds: int = 5) -> None:
+    import random
+    import orjson
+    from api.serialization import _sample_docs
+
+    docs = _sample_docs(count)
+    words = docs[0]["content"].split() if docs else []
+    rng = random.Random(0)
+    for doc in docs:
+        doc["_id"] = str(doc["_id"])
+        # Shuffled so each story differs; identical repeated text would flatter every encoder
+        doc["content"] = " ".join(rng.sample(words, len(words)))
+        doc["teaser"] = doc["content"][:200]
+    body = orjson.dumps(docs)
+    print(f"{count} stories, {len(body):,} bytes of JSON")
+    print(f"{'encoding':<10}{'level':>6}{'bytes':>12}{'ratio':>8}{'ms':>9}{'MB/s':>9}")
+    levels = {"gzip": [1, GZIP_LEVEL, 9], "br": [1, BROTLI_QUALITY, 11], "zstd": [1, ZSTD_LEVEL, 19]}
+    for encoding in ("gzip", "br", "zstd"):
+        if encoding != "gzip" and encoding not in available_encodings():
+            print(f"{encoding:<10}  (not installed)")
+            continue
+        for level in levels[encoding]:
+            best = float("inf")
+            for _ in range(rounds):
+                start = time.perf_counter()
+                packed = compress(body, encoding, level)
+                best = min(best, time.perf_counter() - start)
+            print(
+                f"{encoding:<10}{level:>6}{len(packed):>12,}{len(body) / len(packed):>8.1f}"
+                f"{best * 1000:>9.2f}{len(body) / best / 1e6:>9.1f}"
+            )
+
+if __name__ == "__main__":
+    # python -m api.compression bench [stories] | precompress [directory]
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "bench":
+        _bench(int(sys.argv[2]) if len(sys.argv) > 2 else 200)
+    elif command == "precompress":
+        directory = sys.argv[2] if len(sys.argv) > 2 else "static"
+        print(f"{precompress_directory(directory)} compressed variants written under {directory}")
+    else:
+        print("Usage: python -m api.compression bench [stories] | precompress [directory]")
+        sys.exit(2)
@@ -0,0 +1,36 @@
+import os
+from typing import Any, Optional
+
+from fastapi import Response
+
+# How long clients and shared caches may reuse a story response without revalidating
+STORY_CACHE_MAX_AGE = int(os.getenv("STORY_CACHE_MAX_AGE", "0"))
+
+
+def weak_etag(*parts: Any) -> str:
+    return 'W/"' + "-".join(str(part) for part in parts) + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    # If-None-Match uses weak comparison: W/"x" and "x" are the same tag
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag.removeprefix("W/") in tags
+
+def cache_control(private: bool) -> str:
+    # must-revalidate plus the ETag makes every reuse after max-age a cheap 304
+    scope = "private" if private else "public"
+    return f"{scope}, max-age={STORY_CACHE_MAX_AGE}, must-revalidate"
+
+def tag_response(response: Response, etag: str, private: bool = False) -> None:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control(private)
+
+def not_modified(if_none_match: Optional[str], etag: str, response: Response, private: bool = False) -> Optional[Response]:
+    """Tag `response` and return a 304 if the client already holds this version, else None."""
+    tag_response(response, etag, private)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": response.headers["Cache-Control"]})
+    return None
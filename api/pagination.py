@@ -0,0 +1,52 @@
+import json
+import base64
+import binascii
+from typing import Any, Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(last_id: ObjectId, sort_value: Any = None) -> str:
+    """Opaque cursor pointing just past the last document of a page."""
+    payload = {"id": str(last_id)}
+    if sort_value is not None:
+        payload["k"] = sort_value
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        payload["id"] = ObjectId(payload["id"])
+        return payload
+    except (binascii.Error, ValueError, TypeError, KeyError, InvalidId):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def keyset_filter(cursor: dict, sort_field: str = "_id") -> dict:
+    """Mongo filter for the documents after `cursor` in descending (sort_field, _id) order."""
+    if sort_field == "_id":
+        return {"_id": {"$lt": cursor["id"]}}
+    return {
+        "$or": [
+            {sort_field: {"$lt": cursor["k"]}},
+            {sort_field: cursor["k"], "_id": {"$lt": cursor["id"]}},
+        ]
+    }
+
+def page_size(cursor: Optional[str], limit: Optional[int], default: Optional[int] = None) -> Optional[int]:
+    # Without cursor or limit, legacy list endpoints (no default) keep returning everything
+    if limit is not None:
+        return limit
+    return DEFAULT_PAGE_SIZE if cursor else default
+
+def apply_cursor(query: dict, cursor: Optional[str], sort_field: str = "_id") -> dict:
+    if not cursor:
+        return query
+    after = keyset_filter(decode_cursor(cursor), sort_field)
+    return {"$and": [query, after]} if query else after
@@ -1,22 +1,48 @@
 import os
-from fastapi import APIRouter, HTTPException, Request, Depends
+import math
+from fastapi import APIRouter, Header, HTTPException, Query, Request, Response, Depends
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Literal, Optional # Added Optional for a potential User class later
+from typing import Awaitable, Callable, Dict, List, Literal, Optional, Union # Added Optional for a potential User class later
 from bson import ObjectId
 from io import BytesIO
+from datetime import datetime, timedelta
 from pymongo import ReturnDocument
 
-from services.story_service import (
-    generate_ai_story,
-    generate_story_title,
-    text_to_speech,
-    fetch_image_url
+from services.story_service import text_to_speech, story_summary_fields
+from services.tts_pool import tts_pool, TTSQueueFull
+from services.image_cache import image_cache_stats
+from services.audio_service import (
+    audio_cache,
+    get_story_audio,
+    invalidate_story_audio,
+    refresh_story_audio
+)
+from services.story_pipeline import create_story, StageError
+from services.search import parse_search_query, search_pipeline
+from services.trigram_index import story_index
+from services.user_stats import get_user_stats, record_status_change, record_story_deleted
+from services.library_service import (
+    add_bookmark,
+    apply_bookmarks,
+    remove_bookmark,
+    bookmarked_ids,
+    library_page,
+    remove_story_from_libraries
 )
 from db.mongo import story_collection
+from api.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, apply_cursor, decode_cursor, encode_cursor, keyset_filter, page_size
+from api.streaming import StreamFormat, stream_documents
+from api.serialization import DocumentSerializer, carried_headers, dumps, json_response
+from api.conditional import etag_matches, not_modified, tag_response, weak_etag
+from services.versions import bump_version, current_version
+from services.story_cache import cache_stats, invalidate_story, list_cache, story_cache
+from services.change_feed import change_feed, record_deletion
+from services.story_import import get_import_job, import_stories, iter_lines
+from services.enrichment import pending as enrichment_pending
+from services.write_buffer import write_buffer
 
 router = APIRouter()
-audio_cache = {}  # In-memory cache for audio BytesIO objects
 
 # Define a placeholder for user authentication/dependency injection
 # In a real app, this would be a function that authenticates a user
@@ -46,11 +72,44 @@ class Story(BaseModel):
     content: str
     audio_url: str
     image_url: str
+    # Local thumb/card/full copies, each as {"webp": url, "jpg": url}, plus a tiny inline preview
+    image_variants: Optional[Dict[str, Dict[str, str]]] = None
+    image_placeholder: Optional[str] = None
     source: Literal["ai", "manual"]
     status: Literal["draft", "published"]
-    bookmarked_by: List[str] = []
+    bookmark_count: int = 0
+    # Set when the request names a viewer_id
+    is_bookmarked: Optional[bool] = None
     created_at: str = None
 
+class StorySummary(BaseModel):
+    # Card fields only: no content
+    id: str
+    user_id: str = "guest"
+    username: str = "Guest"
+    genre: str
+    theme: str
+    language: str
+    title: str
+    image_url: str
+    image_variants: Optional[Dict[str, Dict[str, str]]] = None
+    image_placeholder: Optional[str] = None
+    source: Literal["ai", "manual"]
+    status: Literal["draft", "published"]
+    teaser: str = ""
+    word_count: int = 0
+    bookmark_count: int = 0
+    is_bookmarked: Optional[bool] = None
+    created_at: str = None
+
+# Stories migrated from the old schema may still carry a bookmarked_by array; never read it
+STORY_PROJECTION = {"bookmarked_by": 0}
+SUMMARY_PROJECTION = {field: 1 for field in StorySummary.model_fields if field != "id"}
+StoryList = List[Union[Story, StorySummary]]
+# Story routes return JSON bytes built straight from Mongo documents (api/serialization.py)
+STORY_JSON = DocumentSerializer(Story)
+SUMMARY_JSON = DocumentSerializer(StorySummary)
+
 class StoryRequest(BaseModel):
     genre: str
     theme: str
@@ -72,133 +131,73 @@ class ManualStoryRequest(BaseModel):
     user_id: str = "guest"
     username: str = "Guest"
 
+class UserStats(BaseModel):
+    stories: int = 0
+    drafts: int = 0
+    published: int = 0
+    bookmarks: int = 0
+
+class StoryBatchRequest(BaseModel):
+    ids: List[str]
+    view: Literal["full", "summary"] = "full"
+    viewer_id: Optional[str] = None
+
+class StoryBatch(BaseModel):
+    stories: StoryList
+    missing: List[str] = []  # Requested ids that are malformed or don't exist
+
 class StoryUpdate(BaseModel):
     title: str
     content: str
     status: Literal["draft", "published"]
 
-# --- AI-generated story ---
-@router.post("/generate_story", response_model=Story)
-async def generate_story(request_data: StoryRequest, request: Request):
-    if request_data.status == "published" and request_data.user_id == "guest":
-        raise HTTPException(status_code=403, detail="Guests cannot publish stories")
-
-    try:
-        content = await generate_ai_story(
-            request_data.genre,
-            request_data.theme,
-            request_data.length,
-            request_data.language
-        )
-        title = await generate_story_title(content, request_data.language)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Story generation failed: {e}")
+def _server_timing(timings: dict) -> str:
+    return ", ".join(f"{name};dur={ms}" for name, ms in timings.items())
 
+async def _create_story(fields: dict, request: Request, response: Response) -> Response:
     story_id = str(ObjectId())
-
-    try:
-        audio_bytes = await text_to_speech(content, request_data.language)
-        audio_cache[story_id] = audio_bytes
-        audio_url = str(request.url_for("stream_audio", story_id=story_id))
-    except Exception as e:
-        print(f"[WARN] Audio generation failed: {e}")
-        audio_url = str(request.url_for("default_audio"))
-
+    # Audio is synthesized on the first /story_audio request (or prefetched by the pipeline)
+    audio_url = str(request.url_for("stream_audio", story_id=story_id))
     try:
-        image_url = await fetch_image_url(
-            title=title,
-            theme=request_data.theme,
-            genre=request_data.genre
+        story_doc, timings = await create_story(
+            fields, story_id, audio_url, str(request.base_url), str(request.scope.get("time", ""))
         )
-    except Exception:
-        image_url = "https://source.unsplash.com/800x600/?story"
-
-    story_doc = {
-        "_id": ObjectId(story_id),
-        "user_id": request_data.user_id,
-        "username": request_data.username,
-        "genre": request_data.genre,
-        "theme": request_data.theme,
-        "length": request_data.length,
-        "language": request_data.language,
-        "title": title,
-        "content": content,
-        "audio_url": audio_url,
-        "image_url": image_url,
-        "source": "ai",
-        "status": request_data.status,
-        "bookmarked_by": [], # New stories start with an empty bookmarked_by list
-        "created_at": str(request.scope.get("time", ""))
-    }
+    except StageError as e:
+        raise HTTPException(status_code=500, detail=f"Story generation failed: {e}")
+    response.headers["Server-Timing"] = _server_timing(timings)
+    story_index.add(story_doc)
+    invalidate_story()
+    return json_response(dumps(STORY_JSON.to_dict(story_doc)), response)
 
-    await story_collection.insert_one(story_doc)
-    story_doc["id"] = story_id
-    del story_doc["_id"]
-    return Story(**story_doc)
+# --- AI-generated story ---
+@router.post("/generate_story", response_model=Story)
+async def generate_story(request_data: StoryRequest, request: Request, response: Response):
+    if request_data.status == "published" and request_data.user_id == "guest":
+        raise HTTPException(status_code=403, detail="Guests cannot publish stories")
+    return await _create_story({**request_data.model_dump(), "source": "ai"}, request, response)
 
 # --- Manual story ---
 @router.post("/create_manual_story", response_model=Story)
-async def create_manual_story(request_data: ManualStoryRequest, request: Request):
+async def create_manual_story(request_data: ManualStoryRequest, request: Request, response: Response):
     if request_data.status == "published" and request_data.user_id == "guest":
         raise HTTPException(status_code=403, detail="Guests cannot publish stories")
-
-    story_id = str(ObjectId())
-
-    try:
-        audio_bytes = await text_to_speech(request_data.content, request_data.language)
-        audio_cache[story_id] = audio_bytes
-        audio_url = str(request.url_for("stream_audio", story_id=story_id))
-    except Exception as e:
-        print(f"[WARN] Audio generation failed: {e}")
-        audio_url = str(request.url_for("default_audio"))
-
-    try:
-        image_url = await fetch_image_url(
-            title=request_data.title,
-            theme=request_data.theme,
-            genre=request_data.genre
-        )
-    except Exception:
-        image_url = "https://source.unsplash.com/800x600/?story"
-
-    story_doc = {
-        "_id": ObjectId(story_id),
-        "user_id": request_data.user_id,
-        "username": request_data.username,
-        "genre": request_data.genre,
-        "theme": request_data.theme,
-        "length": request_data.length,
-        "language": request_data.language,
-        "title": request_data.title,
-        "content": request_data.content,
-        "audio_url": audio_url,
-        "image_url": image_url,
-        "source": request_data.source,
-        "status": request_data.status,
-        "bookmarked_by": [], # New manual stories also start with an empty bookmarked_by list
-        "created_at": str(request.scope.get("time", ""))
-    }
-
-    await story_collection.insert_one(story_doc)
-    story_doc["id"] = story_id
-    del story_doc["_id"]
-    return Story(**story_doc)
+    return await _create_story(request_data.model_dump(), request, response)
 
 # --- Serve audio stream ---
 @router.get("/story_audio/{story_id}")
 async def stream_audio(story_id: str):
-    audio: BytesIO = audio_cache.get(story_id)
-    if not audio:
-        story = await story_collection.find_one({"_id": ObjectId(story_id)})
+    audio = audio_cache.get(story_id)
+    if audio is None:
+        story = await story_collection.find_one({"_id": ObjectId(story_id)}, {"content": 1, "language": 1})
         if not story:
             raise HTTPException(status_code=404, detail="Story not found")
         try:
-            audio = await text_to_speech(story["content"], story.get("language", "english"))
-            audio_cache[story_id] = audio
+            audio = await get_story_audio(story_id, story["content"], story.get("language", "english"))
+        except TTSQueueFull:
+            raise HTTPException(status_code=503, detail="Audio is busy, please retry shortly", headers={"Retry-After": "5"})
         except Exception:
             return await default_audio()
-    audio.seek(0)
-    return StreamingResponse(audio, media_type="audio/mpeg")
+    return StreamingResponse(BytesIO(audio), media_type="audio/mpeg")
 
 # --- Serve default audio ---
 @router.get("/default_audio")
@@ -211,64 +210,252 @@ async def default_audio():
     audio.seek(0)
     return StreamingResponse(audio, media_type="audio/mpeg")
 
+# --- TTS pool metrics ---
+@router.get("/tts/stats")
+async def get_tts_stats():
+    return tts_pool.stats()
+
+# --- Image cache and Unsplash quota metrics ---
+@router.get("/images/stats")
+async def get_image_stats():
+    return image_cache_stats()
+
+# --- Write-behind buffer batching ---
+@router.get("/writes/stats")
+async def get_write_stats():
+    return write_buffer.stats()
+
+# --- Story and list cache hit rates, per route ---
+@router.get("/cache/stats")
+async def get_cache_stats():
+    return {**cache_stats(), "change_feed": change_feed.stats()}
+
+class ListParams:
+    """Query parameters shared by the story list endpoints.
+
+    `cursor`/`limit` page through results (see api/pagination.py); `stream`
+    writes the whole result set incrementally as NDJSON or a JSON array. When
+    streaming, `cursor` and `limit` still bound the results but no next
+    cursor is reported. `view=summary` returns StorySummary cards; load the
+    full story through /story/{id}. `viewer_id` fills in is_bookmarked for
+    that user (not in streaming mode). Lists share one collection-level ETag
+    (services/versions.py), so polling an unchanged list gets a bodiless 304.
+    """
+
+    def __init__(
+        self,
+        request: Request,
+        cursor: Optional[str] = None,
+        limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+        stream: Optional[StreamFormat] = None,
+        view: Literal["full", "summary"] = "full",
+        viewer_id: Optional[str] = None,
+        if_none_match: Optional[str] = Header(None)
+    ):
+        self.cursor = cursor
+        self.limit = limit
+        self.stream = stream
+        self.view = view
+        self.viewer_id = viewer_id
+        self.if_none_match = if_none_match
+        # Everything above is in the query string, so the URL identifies the page
+        self.cache_key = str(request.url)
+
+    @property
+    def projection(self) -> dict:
+        return SUMMARY_PROJECTION if self.view == "summary" else STORY_PROJECTION
+
+    @property
+    def serializer(self) -> DocumentSerializer:
+        return SUMMARY_JSON if self.view == "summary" else STORY_JSON
+
+async def _render_stories(mongo_cursor, response: Response, params: ListParams, size: Optional[int], sort_key: Optional[str] = None):
+    """Stream or page out a cursor that already fetches `size + 1` documents (`size` when streaming)."""
+    if params.stream:
+        return stream_documents(mongo_cursor, params.serializer.to_dict, params.stream, carried_headers(response))
+    docs = await mongo_cursor.to_list(length=None)
+    if size and len(docs) > size:
+        docs = docs[:size]
+        last = docs[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(last["_id"], last[sort_key] if sort_key else None)
+    stories = [params.serializer.to_dict(story) for story in docs]
+    await _mark_bookmarks(stories, params.viewer_id)
+    return json_response(dumps(stories), response)
+
+async def _mark_bookmarks(stories: List[dict], viewer_id: Optional[str], known: bool = False) -> None:
+    if not viewer_id:
+        return
+    ids = [story["id"] for story in stories]
+    marked = set(ids) if known else await bookmarked_ids(viewer_id, ids)
+    for story in stories:
+        story["is_bookmarked"] = story["id"] in marked
+
+async def _list_response(
+    route: str, response: Response, params: ListParams, render: Callable[[], Awaitable[Response]], private: bool = False
+) -> Response:
+    """Answer a list request: collection ETag check, then `render()`.
+
+    With LIST_MICROCACHE_TTL set, a rendered page (and its ETag) is reused by
+    identical requests for that long, so a burst costs one query.
+    """
+    private = private or params.viewer_id is not None
+    if params.stream or not list_cache.enabled:
+        # Read before the query, so a write racing with it can only make the tag older than the body
+        etag = weak_etag("stories", await current_version())
+        return not_modified(params.if_none_match, etag, response, private) or await render()
+
+    async def _load():
+        etag = weak_etag("stories", await current_version())
+        tag_response(response, etag, private)
+        page = await render()
+        return etag, page.body, carried_headers(page)
+
+    etag, body, headers = await list_cache.get(params.cache_key, _load, route)
+    if etag_matches(params.if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": headers["cache-control"]})
+    return Response(body, media_type="application/json", headers=headers)
+
+async def _list_stories(query: dict, response: Response, params: ListParams, skip: int = 0):
+    """Newest-first stories matching `query`, one keyset page at a time when paginated."""
+    size = page_size(params.cursor, params.limit)
+    mongo_cursor = story_collection.find(apply_cursor(query, params.cursor), params.projection).sort("_id", -1)
+    if skip:
+        mongo_cursor = mongo_cursor.skip(skip)
+    if size:
+        # One extra document tells us whether there is a next page
+        mongo_cursor = mongo_cursor.limit(size if params.stream else size + 1)
+    return await _render_stories(mongo_cursor, response, params, size)
+
+async def _stories_by_rank(ids: List[str], response: Response, params: ListParams) -> Response:
+    """Page through story ids ranked in memory, loading each page with one $in query.
+
+    The cursor carries the offset into `ids`; streaming is not offered here
+    because $in results have to be reordered first.
+    """
+    offset = decode_cursor(params.cursor).get("k") if params.cursor else 0
+    if isinstance(offset, bool) or not isinstance(offset, int) or offset < 0:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    size = page_size(params.cursor, params.limit, DEFAULT_PAGE_SIZE)
+    page = ids[offset:offset + size]
+    if offset + size < len(ids):
+        response.headers["X-Next-Cursor"] = encode_cursor(ObjectId(page[-1]), offset + size)
+
+    found = {}
+    async for story in story_collection.find({"_id": {"$in": [ObjectId(i) for i in page]}}, params.projection):
+        found[str(story["_id"])] = params.serializer.to_dict(story)
+    stories = [found[i] for i in page if i in found]
+    await _mark_bookmarks(stories, params.viewer_id)
+    return json_response(dumps(stories), response)
+
 # --- Get all stories ---
-@router.get("/stories", response_model=List[Story])
-async def get_stories():
-    stories_cursor = story_collection.find().sort("_id", -1)
-    stories = []
-    async for story in stories_cursor:
-        story["id"] = str(story["_id"])
-        del story["_id"]
-        stories.append(Story(**story))
-    return stories
+@router.get("/stories", response_model=StoryList)
+async def get_stories(response: Response, params: ListParams = Depends()):
+    return await _list_response("stories", response, params, lambda: _list_stories({}, response, params))
 
 # --- Paginated stories ---
-@router.get("/stories_paginated", response_model=List[Story])
-async def get_stories_paginated(skip: int = 0, limit: int = 10):
-    cursor = story_collection.find().sort("_id", -1).skip(skip).limit(limit)
-    stories = []
-    async for story in cursor:
-        story["id"] = str(story["_id"])
-        del story["_id"]
-        stories.append(Story(**story))
-    return stories
+@router.get("/stories_paginated", response_model=StoryList)
+async def get_stories_paginated(
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = Query(10, ge=1),
+    cursor: Optional[str] = None,
+    view: Literal["full", "summary"] = "full",
+    if_none_match: Optional[str] = Header(None)
+):
+    # Keyset paging costs the same at any depth; skip is kept for older clients
+    params = ListParams(request, cursor=cursor, limit=limit, view=view, if_none_match=if_none_match)
+    skip = 0 if cursor else skip
+    return await _list_response(
+        "stories_paginated", response, params, lambda: _list_stories({}, response, params, skip=skip)
+    )
 
 # --- Get story by ID ---
 @router.get("/story/{story_id}", response_model=Story)
-async def get_story(story_id: str):
-    story = await story_collection.find_one({"_id": ObjectId(story_id)})
+async def get_story(
+    story_id: str,
+    response: Response,
+    viewer_id: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None)
+):
+    oid = ObjectId(story_id)
+    if if_none_match and not story_cache.enabled:
+        # Revalidation only needs the version, not the content
+        current = await story_collection.find_one({"_id": oid}, {"version": 1, "status": 1})
+        if not current:
+            raise HTTPException(status_code=404, detail="Story not found")
+        private = viewer_id is not None or current.get("status") == "draft"
+        unchanged = not_modified(if_none_match, weak_etag(story_id, current.get("version", 0)), response, private)
+        if unchanged:
+            return unchanged
+    # Hot stories are served from the per-worker cache; a burst of misses shares one find_one
+    story = await story_cache.get(story_id, lambda: story_collection.find_one({"_id": oid}, STORY_PROJECTION), "story")
     if not story:
         raise HTTPException(status_code=404, detail="Story not found")
-    story["id"] = str(story["_id"])
-    del story["_id"]
-    return Story(**story)
+    private = viewer_id is not None or story.get("status") == "draft"
+    unchanged = not_modified(if_none_match, weak_etag(story_id, story.get("version", 0)), response, private)
+    if unchanged:
+        return unchanged
+    story = STORY_JSON.to_dict(story)
+    await _mark_bookmarks([story], viewer_id)
+    return json_response(dumps(story), response)
+
+# --- Get many stories by ID in one query ---
+@router.post("/stories/batch_get", response_model=StoryBatch)
+async def batch_get_stories(batch: StoryBatchRequest):
+    ids = list(dict.fromkeys(batch.ids))  # Drop repeats, keep the requested order
+    if len(ids) > MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_PAGE_SIZE} ids per request")
+    serializer = SUMMARY_JSON if batch.view == "summary" else STORY_JSON
+    projection = SUMMARY_PROJECTION if batch.view == "summary" else STORY_PROJECTION
+    found = {}
+    valid = [ObjectId(i) for i in ids if ObjectId.is_valid(i)]
+    async for story in story_collection.find({"_id": {"$in": valid}}, projection):
+        found[str(story["_id"])] = serializer.to_dict(story)
+    stories = [found[i] for i in ids if i in found]
+    await _mark_bookmarks(stories, batch.viewer_id)
+    return json_response(dumps({"stories": stories, "missing": [i for i in ids if i not in found]}))
 
 # --- Update story ---
 @router.put("/story/{story_id}", response_model=Story)
-async def update_story(story_id: str, update: StoryUpdate):
-    result = await story_collection.find_one_and_update(
+async def update_story(story_id: str, update: StoryUpdate, response: Response):
+    changes = {
+        "title": update.title,
+        "content": update.content,
+        "status": update.status,
+        **story_summary_fields(update.content)
+    }
+    # The previous status tells which counters moved
+    before = await story_collection.find_one_and_update(
         {"_id": ObjectId(story_id)},
-        {
-            "$set": {
-                "title": update.title,
-                "content": update.content,
-                "status": update.status
-            }
-        },
-        return_document=ReturnDocument.AFTER
+        {"$set": changes, "$inc": {"version": 1}, "$currentDate": {"updated_at": True}},
+        projection=STORY_PROJECTION,
+        return_document=ReturnDocument.BEFORE
     )
-    if not result:
+    if not before:
         raise HTTPException(status_code=404, detail="Story not found")
-    result["id"] = str(result["_id"])
-    del result["_id"]
-    return Story(**result)
+    await record_status_change(before.get("user_id", "guest"), before.get("status"), update.status)
+    await bump_version()
+    result = {**before, **changes, "version": before.get("version", 0) + 1}
+    await refresh_story_audio(story_id, result["content"], result.get("language", "english"), result["status"])
+    story_index.add(result)
+    invalidate_story(story_id)
+    tag_response(response, weak_etag(story_id, result["version"]), result["status"] == "draft")
+    return json_response(dumps(STORY_JSON.to_dict(result)), response)
 
 # --- Delete story ---
 @router.delete("/story/{story_id}")
 async def delete_story(story_id: str):
-    result = await story_collection.delete_one({"_id": ObjectId(story_id)})
-    if result.deleted_count == 0:
+    deleted = await story_collection.find_one_and_delete({"_id": ObjectId(story_id)}, {"user_id": 1, "status": 1})
+    if not deleted:
         raise HTTPException(status_code=404, detail="Story not found")
+    await record_story_deleted(deleted.get("user_id", "guest"), deleted.get("status", "published"))
+    await record_deletion(story_id)
+    await bump_version()
+    await invalidate_story_audio(story_id)
+    await remove_story_from_libraries(story_id)
+    story_index.remove(story_id)
+    invalidate_story(story_id)
     return {"message": "Story deleted successfully"}
 
 # --- Bookmark story ---
@@ -286,18 +473,15 @@ async def add_story_to_library(bookmark_request: BookmarkRequest):
         raise HTTPException(status_code=400, detail="Invalid Story ID format")
 
     try:
-        result = await story_collection.update_one(
-            {"_id": ObjectId(story_id)},
-            {"$addToSet": {"bookmarked_by": user_id}}
-        )
-        if result.matched_count == 0:
-            raise HTTPException(status_code=404, detail="Story not found")
-        if result.modified_count == 0:
-            # This means the user_id was already in bookmarked_by, no change made
-            return {"message": "Story already in user's library"}
-        return {"message": "Story added to library"}
+        added = await add_bookmark(user_id, story_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to add story to library: {str(e)}")
+    if added is None:
+        raise HTTPException(status_code=404, detail="Story not found")
+    invalidate_story(story_id)
+    if not added:
+        return {"message": "Story already in user's library"}
+    return {"message": "Story added to library"}
 
 # --- Unbookmark story (Remove from library) ---
 @router.post("/api/library/remove") # A new endpoint for removing from library
@@ -309,74 +493,200 @@ async def remove_story_from_library(bookmark_request: BookmarkRequest):
         raise HTTPException(status_code=400, detail="Invalid Story ID format")
 
     try:
-        result = await story_collection.update_one(
-            {"_id": ObjectId(story_id)},
-            {"$pull": {"bookmarked_by": user_id}}
-        )
-        if result.matched_count == 0:
-            raise HTTPException(status_code=404, detail="Story not found")
-        if result.modified_count == 0:
-            return {"message": "Story was not in user's library"} # Not an error, just wasn't there
-        return {"message": "Story removed from library"}
+        removed = await remove_bookmark(user_id, story_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to remove story from library: {str(e)}")
+    if removed is None:
+        raise HTTPException(status_code=404, detail="Story not found")
+    invalidate_story(story_id)
+    if not removed:
+        return {"message": "Story was not in user's library"} # Not an error, just wasn't there
+    return {"message": "Story removed from library"}
+
 
+# --- Add and remove many bookmarks at once ---
+class LibraryOperation(BaseModel):
+    storyId: str
+    action: Literal["add", "remove"]
+
+class LibraryBulkRequest(BaseModel):
+    userId: str
+    operations: List[LibraryOperation]
+
+class LibraryBulkResult(BaseModel):
+    added: List[str] = []
+    removed: List[str] = []
+    unchanged: List[str] = []  # Already in the requested state
+    missing: List[str] = []  # Malformed ids or stories that don't exist
+
+@router.post("/api/library/bulk", response_model=LibraryBulkResult)
+async def bulk_update_library(bulk_request: LibraryBulkRequest):
+    if len(bulk_request.operations) > MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_PAGE_SIZE} operations per request")
+    try:
+        outcome = await apply_bookmarks(
+            bulk_request.userId, [(op.action, op.storyId) for op in bulk_request.operations]
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to update library: {str(e)}")
+    for story_id in outcome["added"] + outcome["removed"]:
+        invalidate_story(story_id)
+    return LibraryBulkResult(**outcome)
 
 # --- Get bookmarked stories for a specific user ---
-@router.get("/api/users/{user_id}/library", response_model=List[Story])
-async def get_bookmarked_stories_by_user(user_id: str):
-    # Find all stories where the user_id is in the 'bookmarked_by' array
-    cursor = story_collection.find({"bookmarked_by": user_id}).sort("_id", -1)
-    bookmarked_stories = []
-    async for story in cursor:
-        story["id"] = str(story["_id"])
-        del story["_id"] # Remove mongo's _id to fit pydantic model
-        bookmarked_stories.append(Story(**story))
-    return bookmarked_stories
+@router.get("/api/users/{user_id}/library", response_model=StoryList)
+async def get_bookmarked_stories_by_user(
+    user_id: str,
+    response: Response,
+    params: ListParams = Depends()
+):
+    return await _list_response(
+        "library", response, params, lambda: _library_page(user_id, response, params), private=True
+    )
+
+async def _library_page(user_id: str, response: Response, params: ListParams) -> Response:
+    # Most recently bookmarked first; the cursor is keyed on the library entry.
+    # A library page is fetched by id, so `stream` doesn't apply here.
+    size = page_size(params.cursor, params.limit)
+    after = None
+    if params.cursor:
+        position = decode_cursor(params.cursor)
+        if not isinstance(position.get("k"), int):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        # Bookmark time travels as epoch milliseconds, Mongo's own datetime precision
+        position["k"] = datetime(1970, 1, 1) + timedelta(milliseconds=position["k"])
+        after = keyset_filter(position, "created_at")
+    entries = await library_page(user_id, after, size + 1 if size else None).to_list(length=None)
+    if size and len(entries) > size:
+        entries = entries[:size]
+        last = entries[-1]
+        epoch_ms = (last["created_at"] - datetime(1970, 1, 1)) // timedelta(milliseconds=1)
+        response.headers["X-Next-Cursor"] = encode_cursor(last["_id"], epoch_ms)
+
+    found = {}
+    story_ids = [entry["story_id"] for entry in entries]
+    async for story in story_collection.find({"_id": {"$in": story_ids}}, params.projection):
+        found[story["_id"]] = params.serializer.to_dict(story)
+    stories = [found[i] for i in story_ids if i in found]
+    if params.viewer_id == user_id:
+        await _mark_bookmarks(stories, user_id, known=True)
+    else:
+        await _mark_bookmarks(stories, params.viewer_id)
+    return json_response(dumps(stories), response)
 
 # --- Get user-specific stories (all stories created by user) ---
-@router.get("/stories/user/{user_id}", response_model=List[Story])
-async def get_user_stories(user_id: str):
-    cursor = story_collection.find({"user_id": user_id}).sort("_id", -1)
-    stories = []
-    async for story in cursor:
-        story["id"] = str(story["_id"])
-        del story["_id"]
-        stories.append(Story(**story))
-    return stories
+@router.get("/stories/user/{user_id}", response_model=StoryList)
+async def get_user_stories(
+    user_id: str,
+    response: Response,
+    params: ListParams = Depends()
+):
+    # Includes the user's drafts
+    return await _list_response(
+        "user_stories", response, params, lambda: _list_stories({"user_id": user_id}, response, params), private=True
+    )
 
 # --- Get user's draft stories ---
-@router.get("/drafts/{user_id}", response_model=List[Story])
-async def get_drafts(user_id: str):
-    cursor = story_collection.find({"user_id": user_id, "status": "draft"}).sort("_id", -1)
-    stories = []
-    async for story in cursor:
-        story["id"] = str(story["_id"])
-        del story["_id"]
-        stories.append(Story(**story))
-    return stories
+@router.get("/drafts/{user_id}", response_model=StoryList)
+async def get_drafts(
+    user_id: str,
+    response: Response,
+    params: ListParams = Depends()
+):
+    query = {"user_id": user_id, "status": "draft"}
+    return await _list_response("drafts", response, params, lambda: _list_stories(query, response, params), private=True)
 
 # --- Search stories ---
-@router.get("/search_stories", response_model=List[Story])
-async def search_stories(q: str):
-    query = {
-        "$or": [
-            {"title": {"$regex": q, "$options": "i"}},
-            {"theme": {"$regex": q, "$options": "i"}}
-        ]
-    }
-    cursor = story_collection.find(query).sort("_id", -1)
-    stories = []
-    async for story in cursor:
-        story["id"] = str(story["_id"])
-        del story["_id"]
-        stories.append(Story(**story))
-    return stories
-
+@router.get("/search_stories", response_model=StoryList)
+async def search_stories(
+    q: str,
+    response: Response,
+    genre: Optional[str] = None,
+    language: Optional[str] = None,
+    mode: Literal["text", "substring", "fuzzy"] = "text",
+    params: ListParams = Depends()
+):
+    return await _list_response(
+        "search", response, params, lambda: _search_page(q, genre, language, mode, response, params)
+    )
 
+async def _search_page(
+    q: str, genre: Optional[str], language: Optional[str], mode: str, response: Response, params: ListParams
+) -> Response:
+    if mode != "text":
+        # Title/theme matching from the in-memory trigram index ("king" finds "Kingdom")
+        search = story_index.substring if mode == "substring" else story_index.fuzzy
+        return await _stories_by_rank(search(q, genre=genre, language=language), response, params)
+
+    # Ranked full-text search over title, theme and content (text index in db/indexes.py)
+    text = parse_search_query(q)
+    if not text:
+        return json_response(b"[]", response)
+    # Search is always paged; there is no legacy "every match" response to keep
+    size = page_size(params.cursor, params.limit, DEFAULT_PAGE_SIZE)
+    after = None
+    if params.cursor:
+        position = decode_cursor(params.cursor)
+        score = position.get("k")
+        # A relevance score; anything else would compare against the wrong BSON type
+        if isinstance(score, bool) or not isinstance(score, (int, float)) or not math.isfinite(score):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        after = keyset_filter(position, "score")
+    pipeline = search_pipeline(
+        text,
+        genre=genre,
+        language=language,
+        after=after,
+        projection=params.projection,
+        limit=size if params.stream else size + 1
+    )
+    mongo_cursor = story_collection.aggregate(pipeline)
+    return await _render_stories(mongo_cursor, response, params, size, sort_key="score")
+
+
+
+# --- Bulk import of manual stories (NDJSON, one ManualStoryRequest per line) ---
+def validate_manual_story(record: dict) -> dict:
+    """One import record, held to the same rules as /create_manual_story; ValueError marks it invalid."""
+    story = ManualStoryRequest(**record)
+    if story.status == "published" and story.user_id == "guest":
+        raise ValueError("Guests cannot publish stories")
+    return story.model_dump()
+
+async def _import_report(job: dict) -> dict:
+    report = {key: value for key, value in job.items() if key != "_id"}
+    return {"job_id": job["_id"], **report, "enrichment_pending": await enrichment_pending(job["_id"])}
+
+@router.post("/import/stories")
+async def import_manual_stories(request: Request, job_id: Optional[str] = None):
+    """Stream an NDJSON upload into stories; the body is read line by line, never buffered whole.
+
+    Images (and audio, where prefetch applies) are filled in later by the
+    enrichment workers. If the upload breaks off, send the same file again
+    with the returned job_id to pick up after the last saved batch.
+    """
+    job = await import_stories(iter_lines(request.stream()), validate_manual_story, str(request.base_url), job_id)
+    return await _import_report(job)
+
+@router.get("/import/stories/{job_id}")
+async def get_import_progress(job_id: str):
+    job = await get_import_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return await _import_report(job)
+
+# --- Search-as-you-type title suggestions ---
+@router.get("/search_stories/autocomplete")
+async def autocomplete_stories(q: str, limit: int = Query(10, ge=1, le=50)):
+    return story_index.autocomplete(q, limit)
 
 # --- Get count of stories generated by a specific user ---
 @router.get("/api/users/{user_id}/stories/count")
 async def get_user_stories_count(user_id: str):
-    count = await story_collection.count_documents({"user_id": user_id})
-    return {"count": count}
\ No newline at end of file
+    stats = await get_user_stats(user_id)
+    return {"count": stats["stories"]}
+
+# --- Get all of a user's counters (stories, drafts, published, bookmarks) ---
+@router.get("/api/users/{user_id}/stats", response_model=UserStats)
+async def get_user_stats_route(user_id: str):
+    return UserStats(**await get_user_stats(user_id))
\ No newline at end of file
@@ -0,0 +1,132 @@
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+import orjson
+from bson import ObjectId
+from fastapi import Response
+from pydantic import BaseModel
+
+
+class DocumentSerializer:
+    """Turns Motor documents straight into JSON-ready dicts shaped like `model`.
+
+    Documents come from our own writes, so they are trusted: instead of
+    validating each one through the model, a field map precomputed from the
+    model picks the fields (filling in defaults) and `dumps` encodes them
+    with orjson.
+    """
+
+    def __init__(self, model: Type[BaseModel]):
+        self.model = model
+        # (field name, default) in model order; required fields default to None
+        self.fields: Tuple[Tuple[str, Any], ...] = tuple(
+            (name, None if field.is_required() else field.get_default(call_default_factory=True))
+            for name, field in model.model_fields.items()
+        )
+
+    def to_dict(self, doc: dict) -> dict:
+        out = {}
+        for name, default in self.fields:
+            if name == "id":
+                out["id"] = str(doc["_id"]) if "_id" in doc else doc.get("id")
+            else:
+                out[name] = doc.get(name, default)
+        return out
+
+
+def dumps(value: Any) -> bytes:
+    return orjson.dumps(value, default=_default)
+
+def _default(value: Any) -> Any:
+    # Older documents may still hold ObjectIds outside _id (e.g. user_id)
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError
+
+def carried_headers(response: Optional[Response]) -> Optional[Dict[str, str]]:
+    """Headers a route set on its injected `response`, to copy onto a Response it returns itself."""
+    if response is None:
+        return None
+    return {k: v for k, v in response.headers.items() if k not in ("content-length", "content-type")}
+
+def json_response(content: bytes, response: Optional[Response] = None) -> Response:
+    """Raw JSON response, keeping headers a route already set on its injected `response`.
+
+    FastAPI skips response_model validation for Response objects, so
+    response_model on the route only documents the shape.
+    """
+    return Response(content, media_type="application/json", headers=carried_headers(response))
+
+
+# === MICROBENCHMARK ===
+def _sample_docs(count: int) -> List[Dict[str, Any]]:
+    content = "Once upon a time, a lost kingdom waited beneath the sea. " * 40
+    return [
+        {
+            "_id": ObjectId(),
+            "user_id": f"user{i % 50}",
+            "username": "Reader",
+            "genre": "Fantasy",
+            "theme": "A lost kingdom",
+            "length": "medium",
+            "language": "english",
+            "title": f"The Lost Kingdom {i}",
+            "content": content,
+            "audio_url": f"http://localhost:8000/story_audio/{i}",
+            "image_url": "http://localhost:8000/static/images/abc/card.jpg",
+            "source": "ai",
+            "status": "published",
+            "teaser": content[:200],
+            "word_count": 440,
+            "bookmark_count": i % 7,
+            "created_at": "2025-01-01T00:00:00Z",
+        }
+        for i in range(count)
+    ]
+
+def _bench(label: str, run, rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    print(f"{label}: {best * 1000:.2f} ms")
+    return best
+
+def _main(count: int, rounds: int = 20) -> None:
+    import json
+    from pydantic import TypeAdapter
+    from api.routes import Story
+
+    docs = _sample_docs(count)
+    adapter = TypeAdapter(List[Story])
+    serializer = DocumentSerializer(Story)
+
+    def model_path():
+        # What the routes used to do: build models, then FastAPI re-validates and dumps them
+        stories = [Story(**{**doc, "id": str(doc["_id"])}) for doc in docs]
+        return json.dumps(adapter.dump_python(adapter.validate_python(stories), mode="json")).encode()
+
+    def fast_path():
+        return dumps([serializer.to_dict(doc) for doc in docs])
+
+    assert orjson.loads(model_path()) == orjson.loads(fast_path())
+    print(f"{count} stories, best of {rounds}")
+    slow = _bench("Story(**doc) + response_model", model_path, rounds)
+    fast = _bench("DocumentSerializer + orjson", fast_path, rounds)
+    print(f"speedup: {slow / fast:.1f}x")
+    _payload_sizes(docs)
+
+def _payload_sizes(docs: List[Dict[str, Any]]) -> None:
+    # List payload with full stories (before summaries) vs summary cards
+    from api.routes import Story, StorySummary
+
+    full = len(dumps([DocumentSerializer(Story).to_dict(doc) for doc in docs]))
+    summary = len(dumps([DocumentSerializer(StorySummary).to_dict(doc) for doc in docs]))
+    print(f"full stories: {full:,} bytes ({full // len(docs):,} per story)")
+    print(f"summaries: {summary:,} bytes ({summary // len(docs):,} per story), {full / summary:.1f}x smaller")
+
+if __name__ == "__main__":
+    # python -m api.serialization [number of stories]: encode speed and list payload size
+    _main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,51 @@
+import os
+from typing import Any, AsyncIterator, Callable, Dict, Literal, Optional
+
+import orjson
+from fastapi.responses import StreamingResponse
+
+# Documents pulled from Mongo per round trip and written per chunk
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "100"))
+
+StreamFormat = Literal["ndjson", "array"]
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "array": "application/json"}
+
+
+async def _ndjson(cursor, serialize: Callable[[dict], Any]) -> AsyncIterator[bytes]:
+    chunk = bytearray()
+    count = 0
+    async for doc in cursor:
+        chunk += orjson.dumps(serialize(doc))
+        chunk += b"\n"
+        count += 1
+        if count % STREAM_BATCH_SIZE == 0:
+            yield bytes(chunk)
+            chunk.clear()
+    if chunk:
+        yield bytes(chunk)
+
+async def _array(cursor, serialize: Callable[[dict], Any]) -> AsyncIterator[bytes]:
+    chunk = bytearray(b"[")
+    count = 0
+    async for doc in cursor:
+        if count:
+            chunk += b","
+        chunk += orjson.dumps(serialize(doc))
+        count += 1
+        if count % STREAM_BATCH_SIZE == 0:
+            yield bytes(chunk)
+            chunk.clear()
+    chunk += b"]"
+    yield bytes(chunk)
+
+def stream_documents(
+    cursor, serialize: Callable[[dict], Any], fmt: StreamFormat, headers: Optional[Dict[str, str]] = None
+) -> StreamingResponse:
+    """Write a Motor cursor out as NDJSON or a chunked JSON array.
+
+    Only one batch of documents is held in memory at a time, however many match.
+    """
+    cursor = cursor.batch_size(STREAM_BATCH_SIZE)
+    body = _ndjson(cursor, serialize) if fmt == "ndjson" else _array(cursor, serialize)
+    return StreamingResponse(body, media_type=MEDIA_TYPES[fmt], headers=headers)
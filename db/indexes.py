@@ -0,0 +1,130 @@
+import sys
+import asyncio
+from typing import Any, Dict, List
+
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+
+from db.mongo import db, library_collection, story_collection
+
+# Declarative index definitions, created at startup (create_indexes is a no-op for existing ones)
+INDEXES: Dict[str, List[IndexModel]] = {
+    "stories": [
+        # /stories/user/{id}
+        IndexModel([("user_id", ASCENDING), ("_id", DESCENDING)], name="user_id_id"),
+        # /drafts/{id}
+        IndexModel([("user_id", ASCENDING), ("status", ASCENDING), ("_id", DESCENDING)], name="user_id_status_id"),
+        # /search_stories; stories are multilingual, so the per-document language
+        # override points at a field that is never set
+        IndexModel(
+            [("title", TEXT), ("theme", TEXT), ("content", TEXT)],
+            name="story_text",
+            weights={"title": 10, "theme": 5, "content": 1},
+            default_language="english",
+            language_override="text_language"
+        ),
+        # Change polling when change streams are unavailable (services/change_feed.py)
+        IndexModel([("updated_at", ASCENDING)], name="updated_at"),
+        # A resumed import can't write the same input line twice
+        IndexModel(
+            [("import_ref", ASCENDING)], name="import_ref", unique=True,
+            partialFilterExpression={"import_ref": {"$exists": True}}
+        ),
+    ],
+    "enrichment_jobs": [
+        IndexModel([("run_after", ASCENDING)], name="run_after"),
+        IndexModel([("import_job", ASCENDING)], name="import_job"),
+    ],
+    "deleted_stories": [
+        IndexModel([("deleted_at", ASCENDING)], name="deleted_at_ttl", expireAfterSeconds=86400),
+    ],
+    "library": [
+        # One entry per (user, story); also serves is_bookmarked lookups
+        IndexModel([("user_id", ASCENDING), ("story_id", ASCENDING)], name="user_id_story_id", unique=True),
+        # /api/users/{id}/library, most recently bookmarked first
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="user_id_created_at"),
+        # Clearing a deleted story out of every library
+        IndexModel([("story_id", ASCENDING)], name="story_id"),
+    ],
+    "audio_leases": [
+        # Expired leases are taken over explicitly; this just keeps the collection small
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=3600),
+    ],
+}
+
+# Every query shape the router sends: (name, collection, filter, sort)
+QUERY_SHAPES = [
+    ("all stories", story_collection, {}, [("_id", DESCENDING)]),
+    ("user stories", story_collection, {"user_id": "u"}, [("_id", DESCENDING)]),
+    ("drafts", story_collection, {"user_id": "u", "status": "draft"}, [("_id", DESCENDING)]),
+    ("library", library_collection, {"user_id": "u"}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ("search", story_collection, {"$text": {"$search": "king"}, "genre": "Fantasy"}, None),
+]
+
+
+async def ensure_indexes() -> None:
+    for collection_name, indexes in INDEXES.items():
+        await db[collection_name].create_indexes(indexes)
+
+
+async def index_status() -> Dict[str, List[str]]:
+    """Declared indexes that don't exist (yet), by collection; empty when all are in place."""
+    missing = {}
+    for collection_name, indexes in INDEXES.items():
+        existing = await db[collection_name].index_information()
+        absent = [index.document["name"] for index in indexes if index.document["name"] not in existing]
+        if absent:
+            missing[collection_name] = absent
+    return missing
+
+
+async def missing_unique_indexes() -> List[str]:
+    """Declared unique indexes that don't exist, as "collection.name"."""
+    missing = await index_status()
+    return [
+        f"{collection_name}.{index.document['name']}"
+        for collection_name, indexes in INDEXES.items()
+        for index in indexes
+        if index.document.get("unique") and index.document["name"] in missing.get(collection_name, [])
+    ]
+
+
+def _stages(plan: Any):
+    # Walk an explain() plan tree, classic or slot-based engine
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _stages(item)
+
+async def explain_query_shapes() -> Dict[str, List[str]]:
+    """Return the winning plan stages of every router query shape."""
+    plans = {}
+    for name, collection, query, sort in QUERY_SHAPES:
+        cursor = collection.find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explained = await cursor.limit(20).explain()
+        plans[name] = list(_stages(explained["queryPlanner"]["winningPlan"]))
+    return plans
+
+async def _main(explain: bool) -> int:
+    await ensure_indexes()
+    print("Indexes ensured")
+    if not explain:
+        return 0
+
+    plans = await explain_query_shapes()
+    for name, stages in plans.items():
+        print(f"{name}: {' <- '.join(stages)}")
+    collscans = [name for name, stages in plans.items() if "COLLSCAN" in stages]
+    if collscans:
+        print(f"[ERROR] Collection scans: {', '.join(collscans)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    # python -m db.indexes [--explain]
+    sys.exit(asyncio.run(_main("--explain" in sys.argv[1:])))
@@ -0,0 +1,102 @@
+import sys
+import asyncio
+
+from pymongo import UpdateOne
+
+from db.mongo import library_collection, story_collection
+from services.story_service import story_summary_fields
+from services.user_stats import reconcile_user_stats
+from services.versions import bump_version
+
+BATCH_SIZE = 500
+
+
+async def backfill_story_summaries() -> int:
+    """Add teaser, word_count and bookmark_count to stories created before they existed."""
+    cursor = story_collection.find(
+        {"$or": [{"teaser": {"$exists": False}}, {"bookmark_count": {"$exists": False}}]},
+        {"content": 1, "bookmarked_by": 1, "bookmark_count": 1}
+    )
+    updated = 0
+    batch = []
+    async for story in cursor:
+        fields = story_summary_fields(story.get("content", ""))
+        if "bookmark_count" not in story:
+            fields["bookmark_count"] = len(story.get("bookmarked_by", []))
+        batch.append(UpdateOne({"_id": story["_id"]}, {"$set": fields, "$inc": {"version": 1}, "$currentDate": {"updated_at": True}}))
+        if len(batch) >= BATCH_SIZE:
+            updated += (await story_collection.bulk_write(batch, ordered=False)).modified_count
+            batch = []
+    if batch:
+        updated += (await story_collection.bulk_write(batch, ordered=False)).modified_count
+    return updated
+
+async def move_bookmarks_to_library() -> int:
+    """Turn bookmarked_by arrays into library entries and drop the arrays.
+
+    Safe to re-run: entries are upserted, and a story's array is only unset
+    once its entries are written. bookmark_count is recounted from the
+    library, so bookmarks made through the library since deploy are kept.
+    """
+    cursor = story_collection.find({"bookmarked_by": {"$exists": True}}, {"bookmarked_by": 1})
+    updated = 0
+    entries, story_ids = [], []
+    async for story in cursor:
+        users = list(dict.fromkeys(story.get("bookmarked_by") or []))
+        # The original bookmark time wasn't recorded; the story's creation time keeps the order plausible
+        created_at = story["_id"].generation_time.replace(tzinfo=None)
+        for user_id in users:
+            entries.append(UpdateOne(
+                {"user_id": user_id, "story_id": story["_id"]},
+                {"$setOnInsert": {"created_at": created_at}},
+                upsert=True
+            ))
+        story_ids.append(story["_id"])
+        if len(story_ids) >= BATCH_SIZE or len(entries) >= BATCH_SIZE:
+            updated += await _flush_library_batch(entries, story_ids)
+            entries, story_ids = [], []
+    if story_ids:
+        updated += await _flush_library_batch(entries, story_ids)
+    return updated
+
+async def _flush_library_batch(entries: list, story_ids: list) -> int:
+    if entries:
+        await library_collection.bulk_write(entries, ordered=False)
+    counts = {
+        row["_id"]: row["count"]
+        async for row in library_collection.aggregate([
+            {"$match": {"story_id": {"$in": story_ids}}},
+            {"$group": {"_id": "$story_id", "count": {"$sum": 1}}},
+        ])
+    }
+    stories = [
+        UpdateOne(
+            {"_id": story_id},
+            {"$set": {"bookmark_count": counts.get(story_id, 0)}, "$unset": {"bookmarked_by": ""},
+             "$inc": {"version": 1}, "$currentDate": {"updated_at": True}}
+        )
+        for story_id in story_ids
+    ]
+    return (await story_collection.bulk_write(stories, ordered=False)).modified_count
+
+MIGRATIONS = {
+    "summaries": backfill_story_summaries,
+    "library": move_bookmarks_to_library,
+    # Not a one-off: rerun whenever the counters may have drifted
+    "user_stats": reconcile_user_stats,
+}
+
+async def _main(names) -> int:
+    unknown = [name for name in names if name not in MIGRATIONS]
+    if not names or unknown:
+        print(f"Usage: python -m db.migrations {{{'|'.join(MIGRATIONS)}}} ...")
+        return 2
+    for name in names:
+        count = await MIGRATIONS[name]()
+        print(f"{name}: {count} documents updated")
+    # Rewritten stories must not keep answering 304 to cached lists
+    await bump_version()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main(sys.argv[1:])))
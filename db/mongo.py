@@ -1,5 +1,10 @@
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
 import os
+import time
+import asyncio
+import importlib.util
+from typing import List
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -8,10 +13,149 @@ MONGO_URI = os.getenv("MONGO_URI")
 if not MONGO_URI:
     raise Exception("MONGO_URI is not set in environment variables")
 
-client = AsyncIOMotorClient(MONGO_URI)
+# Connection pool and timeouts (pymongo option names, per process)
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "10"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "0")) or None
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "0")) or None
+# Wire compression, in order of preference; zstd and snappy need their optional packages
+MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "zstd,snappy,zlib")
+# How long startup keeps retrying the first ping before giving up
+MONGO_WARMUP_TIMEOUT = float(os.getenv("MONGO_WARMUP_TIMEOUT", "30"))
+
+_COMPRESSOR_PACKAGES = {"zstd": "zstandard", "snappy": "snappy", "zlib": "zlib"}
+
+
+def _compressors() -> List[str]:
+    available = []
+    for name in (c.strip().lower() for c in MONGO_COMPRESSORS.split(",") if c.strip()):
+        package = _COMPRESSOR_PACKAGES.get(name)
+        if package and importlib.util.find_spec(package):
+            available.append(name)
+        else:
+            print(f"[WARN] Mongo compressor {name} unavailable, skipping")
+    return available
+
+
+class PoolStats(monitoring.ConnectionPoolListener):
+    """Counts open and checked-out connections across the client's pools.
+
+    Called from the driver's threads without locking, so figures are approximate.
+    """
+
+    def __init__(self):
+        self.open = 0
+        self.checked_out = 0
+
+    def connection_created(self, event):
+        self.open += 1
+
+    def connection_closed(self, event):
+        self.open -= 1
+
+    def connection_checked_out(self, event):
+        self.checked_out += 1
+
+    def connection_checked_in(self, event):
+        self.checked_out -= 1
+
+    # The remaining pool events aren't needed
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        pass
+
+    def snapshot(self) -> dict:
+        return {
+            "open": self.open,
+            "checked_out": self.checked_out,
+            "max": MONGO_MAX_POOL_SIZE,
+            "utilization": round(self.checked_out / MONGO_MAX_POOL_SIZE, 4) if MONGO_MAX_POOL_SIZE else 0.0,
+        }
+
+
+pool_stats = PoolStats()
+
+# Created here so collections can be module-level; no connection is opened until connect()
+client = AsyncIOMotorClient(
+    MONGO_URI,
+    connect=False,
+    maxPoolSize=MONGO_MAX_POOL_SIZE,
+    minPoolSize=MONGO_MIN_POOL_SIZE,
+    maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+    serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+    socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+    waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+    compressors=_compressors() or None,
+    event_listeners=[pool_stats],
+)
 db = client["story-gen"]
 
-# Main collection: all stories, including bookmarked info inside each story document
+
+# === LIFECYCLE ===
+async def ping() -> float:
+    """Round trip to the server in milliseconds."""
+    start = time.perf_counter()
+    await client.admin.command("ping")
+    return round((time.perf_counter() - start) * 1000, 2)
+
+async def connect() -> None:
+    """Wait for the server, then open minPoolSize connections so the first requests don't pay for them."""
+    deadline = time.monotonic() + MONGO_WARMUP_TIMEOUT
+    while True:
+        try:
+            await ping()
+            break
+        except Exception as e:
+            if time.monotonic() >= deadline:
+                raise
+            print(f"[WARN] MongoDB not reachable yet: {e}")
+            await asyncio.sleep(1)
+    # Concurrent pings each need their own connection
+    await asyncio.gather(*(ping() for _ in range(MONGO_MIN_POOL_SIZE)))
+
+def close() -> None:
+    client.close()
+
+# Main collection: all stories
 story_collection = db["stories"]
 
-# You can remove saved_stories_collection if unused
+# One document per bookmark: (user_id, story_id, created_at)
+library_collection = db["library"]
+# Per-user counters (stories, drafts, published, bookmarks), kept up to date with $inc
+user_stats_collection = db["user_stats"]
+# Change counters ({_id: name, version}) behind the list endpoints' ETags
+collection_version_collection = db["collection_versions"]
+# Tombstones of deleted stories, for nodes polling for changes instead of watching a change stream
+deleted_story_collection = db["deleted_stories"]
+# Bulk import progress, and the queue of imported stories awaiting images and audio
+import_job_collection = db["import_jobs"]
+enrichment_collection = db["enrichment_jobs"]
+
+# Synthesized story audio, shared by every worker, and the leases that serialize its synthesis
+audio_collection = db["story_audio"]
+audio_lease_collection = db["audio_leases"]
+# Content-addressed TTS segments (one sentence each), shared across stories and edits
+audio_segment_collection = db["audio_segments"]
+# Unsplash search results keyed by normalized query
+image_cache_collection = db["image_cache"]
@@ -1,11 +1,65 @@
-from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
+from contextlib import asynccontextmanager
+import asyncio
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from api.routes import router
+from api.compression import CompressionMiddleware, PrecompressedStaticFiles
+from services.tts_pool import tts_pool
+from services import tts_client
+from db.indexes import ensure_indexes, index_status, missing_unique_indexes
+from db import mongo
+from db.mongo import story_collection, pool_stats
+from services.trigram_index import story_index
+from services.change_feed import change_feed
+from services import enrichment
+from services.image_proxy import ensure_default_artwork
+from services.write_buffer import write_buffer
 import os
 
+# Readiness also fails while declared indexes are missing, if set
+READY_REQUIRE_INDEXES = os.getenv("READY_REQUIRE_INDEXES", "0") == "1"
+READY_PING_TIMEOUT = float(os.getenv("READY_PING_TIMEOUT", "2"))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.ready = False
+    # Fails startup if MongoDB stays unreachable for MONGO_WARMUP_TIMEOUT
+    await mongo.connect()
+    try:
+        await ensure_indexes()
+    except Exception as e:
+        print(f"[WARN] Index creation failed: {e}")
+    # Bookmarks and resumed imports rely on these to stay duplicate-free; don't serve without them
+    unique_missing = await missing_unique_indexes()
+    if unique_missing:
+        raise RuntimeError(f"Unique indexes missing: {', '.join(unique_missing)}")
+    try:
+        await story_index.load(story_collection)
+    except Exception as e:
+        print(f"[WARN] Trigram index build failed: {e}")
+    try:
+        # Stories whose own artwork fails fall back to this one
+        await ensure_default_artwork()
+    except Exception as e:
+        print(f"[WARN] Default artwork render failed: {e}")
+    # Keeps caches and the index in step with writes from other nodes
+    change_feed.start()
+    enrichment.start_workers()
+    # Warm: connections open, indexes ensured, search index loaded
+    app.state.ready = True
+    yield
+    app.state.ready = False
+    await enrichment.stop_workers()
+    await change_feed.stop()
+    # Nothing acknowledged to a caller may be left unwritten
+    await write_buffer.flush()
+    mongo.close()
+    await tts_client.close_client()
+    tts_pool.shutdown()
+
 app = FastAPI(
     title="AI-Powered Story Generator API",
+    lifespan=lifespan,
     docs_url="/docs",
     redoc_url=None,
     openapi_url="/openapi.json"
@@ -14,8 +68,8 @@ app = FastAPI(
 # Ensure static directory exists
 os.makedirs("static", exist_ok=True)
 
-# Mount static directory
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Mount static directory; serves .zst/.br/.gz siblings written by `python -m api.compression precompress`
+app.mount("/static", PrecompressedStaticFiles(directory="static"), name="static")
 
 origins = [
     "http://localhost:3000",  
@@ -30,8 +84,12 @@ app.add_middleware(
     allow_credentials=True, 
     allow_methods=["*"],   
     allow_headers=["*"],  
+    expose_headers=["X-Next-Cursor", "Server-Timing", "ETag"],
 )
 
+# gzip/br/zstd for JSON and text above COMPRESSION_MIN_SIZE; audio and images pass through
+app.add_middleware(CompressionMiddleware)
+
 # API routes
 app.include_router(router, tags=["Story"])
 
@@ -45,6 +103,29 @@ def read_root():
 def health_check():
     return {"status": "ok"}
 
+# Readiness: only route traffic to a node that is warm and can reach MongoDB
+@app.get("/ready")
+async def readiness_check(response: Response):
+    report = {"warm": getattr(app.state, "ready", False), "pool": pool_stats.snapshot()}
+    try:
+        report["ping_ms"] = await asyncio.wait_for(mongo.ping(), READY_PING_TIMEOUT)
+    except Exception as e:
+        report["ping_ms"] = None
+        report["error"] = str(e) or type(e).__name__
+    try:
+        missing = await index_status()
+        report["indexes"] = {"ok": not missing, "missing": missing}
+    except Exception as e:
+        report["indexes"] = {"ok": False, "error": str(e)}
+
+    ready = report["warm"] and report["ping_ms"] is not None
+    if READY_REQUIRE_INDEXES:
+        ready = ready and report["indexes"]["ok"]
+    report["ready"] = ready
+    if not ready:
+        response.status_code = 503
+    return report
+
 # Optional run
 if __name__ == "__main__":
     import uvicorn
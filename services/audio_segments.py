@@ -0,0 +1,122 @@
+import os
+import re
+import asyncio
+import hashlib
+from datetime import datetime
+from typing import Dict, List
+
+from bson import Binary
+from cachetools import LRUCache
+
+from db.mongo import audio_segment_collection
+from services.story_service import LANGUAGE_CODES, synthesize_speech
+from services.tts_client import ABBREVIATIONS
+from services.tts_pool import TTS_WORKERS
+
+# In-memory budget for hot segments, in bytes of MP3
+AUDIO_SEGMENT_CACHE_BYTES = int(os.getenv("AUDIO_SEGMENT_CACHE_BYTES", str(64 * 1024 * 1024)))
+
+# Segments one call synthesizes at once; below the TTS pool's workers, so a long story
+# neither overflows the pool's queue (TTSQueueFull) nor takes every worker
+SEGMENT_TTS_CONCURRENCY = int(os.getenv("SEGMENT_TTS_CONCURRENCY", str(max(1, TTS_WORKERS // 2))))
+
+_segment_cache: LRUCache = LRUCache(maxsize=AUDIO_SEGMENT_CACHE_BYTES, getsizeof=len)
+_inflight: Dict[str, asyncio.Task] = {}
+
+_PARAGRAPH_RE = re.compile(r"\n\s*\n|\n")
+_SENTENCE_RE = re.compile(r"(?<=[.!?…。！？])\s+|(?<=[.!?…。！？][\"'”’)\]])\s+")
+
+
+def split_segments(content: str) -> List[str]:
+    """Split story text into sentence segments, the unit of audio caching."""
+    segments = []
+    for paragraph in _PARAGRAPH_RE.split(content):
+        carry = ""
+        for sentence in _SENTENCE_RE.split(paragraph.strip()):
+            sentence = " ".join(f"{carry} {sentence}".split())
+            carry = ""
+            words = sentence.split()
+            # "Dr. Who" is one sentence, not two
+            if words and words[-1].rstrip(".").lower() in ABBREVIATIONS and words[-1].endswith("."):
+                carry = sentence
+                continue
+            if sentence:
+                segments.append(sentence)
+        if carry:
+            segments.append(carry)
+    return segments
+
+def segment_key(text: str, lang_code: str) -> str:
+    return hashlib.sha256(f"{lang_code}\0{text}".encode("utf-8")).hexdigest()
+
+def content_hash(content: str, language: str) -> str:
+    return hashlib.sha256(f"{language.lower()}\0{content}".encode("utf-8")).hexdigest()
+
+def _strip_id3(audio: bytes) -> bytes:
+    # Drop a leading ID3v2 tag so concatenated segments form one continuous frame stream
+    if len(audio) > 10 and audio[:3] == b"ID3":
+        size = (audio[6] << 21) | (audio[7] << 14) | (audio[8] << 7) | audio[9]
+        return audio[10 + size:]
+    return audio
+
+
+async def _synthesize_segment(key: str, text: str, lang_code: str) -> bytes:
+    audio = _strip_id3(await synthesize_speech(text, lang_code))
+    try:
+        await audio_segment_collection.update_one(
+            {"_id": key},
+            {"$setOnInsert": {"audio": Binary(audio), "lang": lang_code, "created_at": datetime.utcnow()}},
+            upsert=True
+        )
+    except Exception as e:
+        print(f"[WARN] Failed to persist audio segment {key}: {e}")
+    _segment_cache[key] = audio
+    return audio
+
+def _coalesced(key: str, text: str, lang_code: str) -> asyncio.Task:
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.create_task(_synthesize_segment(key, text, lang_code))
+        _inflight[key] = task
+        task.add_done_callback(lambda t: _inflight.pop(key, None))
+    return task
+
+async def synthesize_segments(segments: List[str], lang_code: str) -> List[bytes]:
+    """Return audio for each segment, only synthesizing those missing from both cache tiers."""
+    keys = [segment_key(text, lang_code) for text in segments]
+    found: Dict[str, bytes] = {}
+
+    for key in keys:
+        audio = _segment_cache.get(key)
+        if audio is not None:
+            found[key] = audio
+
+    missing = list({key for key in keys if key not in found})
+    if missing:
+        async for doc in audio_segment_collection.find({"_id": {"$in": missing}}, {"audio": 1}):
+            audio = bytes(doc["audio"])
+            found[doc["_id"]] = audio
+            _segment_cache[doc["_id"]] = audio
+
+    pending = {}
+    for key, text in zip(keys, segments):
+        if key not in found and key not in pending:
+            pending[key] = text
+    if pending:
+        slots = asyncio.Semaphore(SEGMENT_TTS_CONCURRENCY)
+
+        async def _one(key: str, text: str) -> bytes:
+            async with slots:
+                return await asyncio.shield(_coalesced(key, text, lang_code))
+
+        results = await asyncio.gather(*(_one(key, text) for key, text in pending.items()))
+        found.update(zip(pending.keys(), results))
+
+    return [found[key] for key in keys]
+
+async def synthesize_story_audio(content: str, language: str = "english") -> bytes:
+    lang_code = LANGUAGE_CODES.get(language.lower(), "en")
+    segments = split_segments(content)
+    if not segments:
+        raise ValueError("Story has no text to speak")
+    return b"".join(await synthesize_segments(segments, lang_code))
@@ -0,0 +1,178 @@
+import os
+import socket
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Set
+
+from bson import Binary
+from cachetools import LRUCache
+from pymongo.errors import DuplicateKeyError
+
+from db.mongo import audio_collection, audio_lease_collection
+from services.audio_segments import content_hash, synthesize_story_audio
+
+# How long a worker may hold the synthesis lease for one story before others may take over
+AUDIO_LEASE_SECONDS = int(os.getenv("AUDIO_LEASE_SECONDS", "120"))
+AUDIO_LEASE_POLL_SECONDS = float(os.getenv("AUDIO_LEASE_POLL_SECONDS", "0.5"))
+# Which new stories get audio synthesized right away: "none", "published" or "all"
+AUDIO_PREFETCH = os.getenv("AUDIO_PREFETCH", "none").lower()
+# In-memory budget for whole-story MP3s, in bytes; evicted ones are reloaded from Mongo
+AUDIO_CACHE_BYTES = int(os.getenv("AUDIO_CACHE_BYTES", str(128 * 1024 * 1024)))
+
+WORKER_ID = f"{socket.gethostname()}-{os.getpid()}"
+
+class _AudioCache(LRUCache):
+    """LRU of synthesized MP3 bytes that forgets an entry's content hash along with it."""
+
+    def popitem(self):
+        story_id, audio = super().popitem()
+        if story_id not in _inflight:
+            _versions.pop(story_id, None)
+        return story_id, audio
+
+
+audio_cache: LRUCache = _AudioCache(maxsize=AUDIO_CACHE_BYTES, getsizeof=len)
+_versions: Dict[str, str] = {}  # story id -> content hash the cached or in-flight audio is built from
+_inflight: Dict[str, asyncio.Task] = {}
+_background: Set[asyncio.Task] = set()
+
+
+# === LEASES ===
+async def _acquire_lease(story_id: str) -> bool:
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=AUDIO_LEASE_SECONDS)
+    try:
+        await audio_lease_collection.insert_one({"_id": story_id, "owner": WORKER_ID, "expires_at": expires_at})
+        return True
+    except DuplicateKeyError:
+        pass
+    # Take over a lease whose holder died or stalled
+    taken = await audio_lease_collection.find_one_and_update(
+        {"_id": story_id, "expires_at": {"$lt": now}},
+        {"$set": {"owner": WORKER_ID, "expires_at": expires_at}}
+    )
+    return taken is not None
+
+async def _release_lease(story_id: str) -> None:
+    await audio_lease_collection.delete_one({"_id": story_id, "owner": WORKER_ID})
+
+
+# === SYNTHESIS ===
+async def _load_stored_audio(story_id: str, version: str) -> Optional[bytes]:
+    # Audio stored for an older revision of the story does not count
+    doc = await audio_collection.find_one({"_id": story_id, "content_hash": version}, {"audio": 1})
+    return bytes(doc["audio"]) if doc else None
+
+async def _load_or_synthesize(story_id: str, content: str, language: str) -> bytes:
+    version = content_hash(content, language)
+    while True:
+        audio = await _load_stored_audio(story_id, version)
+        if audio is not None:
+            return audio
+
+        if await _acquire_lease(story_id):
+            try:
+                # Another worker may have finished between our read and the lease
+                audio = await _load_stored_audio(story_id, version)
+                if audio is None:
+                    # Assembled from cached sentence segments; only new sentences hit TTS
+                    audio = await synthesize_story_audio(content, language)
+                    await audio_collection.replace_one(
+                        {"_id": story_id},
+                        {
+                            "audio": Binary(audio),
+                            "content_hash": version,
+                            "language": language,
+                            "created_at": datetime.utcnow()
+                        },
+                        upsert=True
+                    )
+                return audio
+            finally:
+                await _release_lease(story_id)
+
+        # Someone else is synthesizing this story; wait for their result or an expired lease
+        await asyncio.sleep(AUDIO_LEASE_POLL_SECONDS)
+
+async def get_story_audio(story_id: str, content: str, language: str = "english") -> bytes:
+    """Return MP3 bytes for a story, synthesizing it at most once across concurrent requests."""
+    audio = audio_cache.get(story_id)
+    if audio is not None:
+        return audio
+
+    task = _inflight.get(story_id)
+    if task is None:
+        task = asyncio.create_task(_load_or_synthesize(story_id, content, language))
+        _inflight[story_id] = task
+        _versions[story_id] = content_hash(content, language)
+
+        def _done(t: asyncio.Task) -> None:
+            # A task orphaned by invalidate_story_audio must not repopulate the cache
+            if _inflight.get(story_id) is not t:
+                return
+            del _inflight[story_id]
+            if t.cancelled() or t.exception() is not None:
+                _versions.pop(story_id, None)
+                return
+            try:
+                audio_cache[story_id] = t.result()
+            except ValueError:
+                _versions.pop(story_id, None)  # Larger than the whole budget; served from Mongo instead
+
+        task.add_done_callback(_done)
+
+    # Shield so one client disconnecting does not cancel synthesis for the others
+    return await asyncio.shield(task)
+
+def forget_story_audio(story_id: str) -> bool:
+    """Drop this worker's copy only, e.g. when another node changed the story."""
+    _inflight.pop(story_id, None)
+    _versions.pop(story_id, None)
+    return audio_cache.pop(story_id, None) is not None
+
+def holds_story_audio(story_id: str) -> bool:
+    return story_id in _versions
+
+def forget_stale_audio(story_id: str, content: str, language: str) -> bool:
+    """Drop this worker's copy unless it was built from this content and language."""
+    version = _versions.get(story_id)
+    if version is None or version == content_hash(content, language):
+        return False
+    return forget_story_audio(story_id)
+
+def clear_audio_cache() -> None:
+    audio_cache.clear()
+    for story_id in [k for k in _versions if k not in _inflight]:
+        del _versions[story_id]
+
+async def invalidate_story_audio(story_id: str) -> bool:
+    """Drop story-level audio; returns whether any had been built."""
+    cached = forget_story_audio(story_id)
+    result = await audio_collection.delete_one({"_id": story_id})
+    return cached or result.deleted_count > 0
+
+
+# === PREFETCH ===
+def should_prefetch(status: str) -> bool:
+    return AUDIO_PREFETCH == "all" or (AUDIO_PREFETCH == "published" and status == "published")
+
+def _spawn(story_id: str, content: str, language: str, reason: str) -> None:
+    async def _build() -> None:
+        try:
+            await get_story_audio(story_id, content, language)
+        except Exception as e:
+            print(f"[WARN] Audio {reason} failed for {story_id}: {e}")
+
+    task = asyncio.create_task(_build())
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+def schedule_prefetch(story_id: str, content: str, language: str, status: str) -> None:
+    if should_prefetch(status):
+        _spawn(story_id, content, language, "prefetch")
+
+async def refresh_story_audio(story_id: str, content: str, language: str, status: str) -> None:
+    """Invalidate audio after an edit and rebuild it from segments if it was in use."""
+    had_audio = await invalidate_story_audio(story_id)
+    if had_audio or should_prefetch(status):
+        _spawn(story_id, content, language, "rebuild")
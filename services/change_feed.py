@@ -0,0 +1,198 @@
+import os
+import asyncio
+from datetime import datetime, timedelta
+from typing import Iterable, Optional, Set
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from db.mongo import deleted_story_collection, story_collection
+from services.audio_service import clear_audio_cache, forget_stale_audio, forget_story_audio, holds_story_audio
+from services.story_cache import invalidate_story, list_cache, story_cache
+from services.trigram_index import INDEXED_FIELDS, story_index
+
+# "auto" watches a change stream and falls back to polling when the server
+# has none (standalone mongod); "stream", "poll" or "off" force a mode
+CHANGE_FEED_MODE = os.getenv("CHANGE_FEED_MODE", "auto").lower()
+CHANGE_FEED_POLL_SECONDS = float(os.getenv("CHANGE_FEED_POLL_SECONDS", "2"))
+# Polling re-reads this much history each round to absorb clock skew between nodes
+CHANGE_FEED_POLL_OVERLAP = timedelta(seconds=float(os.getenv("CHANGE_FEED_POLL_OVERLAP", "5")))
+CHANGE_FEED_RETRY_SECONDS = 1.0
+
+# Server error codes
+_NOT_REPLICA_SET = 40573
+_HISTORY_LOST = 286
+
+# Fields story audio is built from; other writes (bookmarks, versions, images) keep it
+_AUDIO_FIELDS = {"content", "language"}
+
+
+async def record_deletion(story_id: str) -> None:
+    """Leave a tombstone for polling nodes; change streams see deletes on their own."""
+    await deleted_story_collection.replace_one({"_id": story_id}, {"deleted_at": datetime.utcnow()}, upsert=True)
+
+
+class ChangeFeed:
+    """Keeps this node's caches and search index in step with writes from every node.
+
+    Watches the stories collection and fans each change out to the story
+    and list caches, the audio cache and the trigram index. Changes this
+    node made itself come back too; applying them again is harmless.
+    """
+
+    def __init__(self, mode: str = CHANGE_FEED_MODE):
+        self.mode = mode
+        self.active_mode: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+        self._resume_token = None
+        self.applied = 0
+
+    # === FAN-OUT ===
+    def apply(self, story_id: str, story: Optional[dict], changed: Optional[Set[str]] = None) -> None:
+        """`story` holds the indexed fields after the write, None once it's deleted.
+
+        `changed` names the top-level fields the write touched, None when
+        unknown. When `story` also carries the new content, audio is only
+        dropped if it was built from something else, so this node's own
+        echoes keep theirs. The index is only touched when indexed fields
+        differ.
+        """
+        invalidate_story(story_id)
+        if story is None:
+            forget_story_audio(story_id)
+            story_index.remove(story_id)
+        else:
+            if changed is None or changed & _AUDIO_FIELDS:
+                if "content" in story:
+                    forget_stale_audio(story_id, story["content"], story.get("language") or "english")
+                else:
+                    forget_story_audio(story_id)
+            story_index.update({"id": story_id, **{field: story.get(field, "") for field in INDEXED_FIELDS}})
+        self.applied += 1
+
+    def apply_change(self, change: dict) -> None:
+        """Apply one change stream event, as projected by `_watch`."""
+        story_id = str(change["documentKey"]["_id"])
+        story = change.get("fullDocument")
+        if change["operationType"] == "delete" or story is None:
+            # An update whose story was deleted before the lookup has no fullDocument
+            self.apply(story_id, None)
+            return
+        changed = None
+        if change["operationType"] == "insert":
+            changed = set()  # A new story has no audio anywhere to go stale
+        elif change["operationType"] == "update":
+            changed = {field.split(".", 1)[0] for field in change.get("changedFields") or ()}
+            updated = change.get("updateDescription", {}).get("updatedFields", {})
+            if "content" in updated:
+                story = {**story, "content": updated["content"]}
+        self.apply(story_id, story, changed)
+
+    async def resync(self) -> None:
+        """Start over when changes may have been missed."""
+        story_cache.clear()
+        list_cache.clear()
+        clear_audio_cache()
+        await story_index.load(story_collection)
+
+    # === CHANGE STREAM ===
+    async def _watch(self) -> None:
+        updated_fields = {"$objectToArray": {"$ifNull": ["$updateDescription.updatedFields", {}]}}
+        pipeline = [
+            {"$match": {"operationType": {"$in": ["insert", "update", "replace", "delete"]}}},
+            {"$project": {
+                "operationType": 1,
+                "documentKey": 1,
+                **{f"fullDocument.{field}": 1 for field in INDEXED_FIELDS},
+                # Names only, so a bookmark $inc stays a tiny event; content travels
+                # just when it is what changed
+                "changedFields": {"$concatArrays": [
+                    {"$map": {"input": updated_fields, "in": "$$this.k"}},
+                    {"$ifNull": ["$updateDescription.removedFields", []]},
+                ]},
+                "updateDescription.updatedFields.content": 1,
+            }},
+        ]
+        while True:
+            try:
+                async with story_collection.watch(
+                    pipeline, full_document="updateLookup", resume_after=self._resume_token
+                ) as stream:
+                    self.active_mode = "stream"
+                    async for change in stream:
+                        self.apply_change(change)
+                        self._resume_token = stream.resume_token
+            except OperationFailure as e:
+                if e.code == _NOT_REPLICA_SET:
+                    raise
+                if e.code == _HISTORY_LOST:
+                    print("[WARN] Change stream fell off the oplog; rebuilding caches and index")
+                    self._resume_token = None
+                    await self.resync()
+                    continue
+                print(f"[WARN] Change stream failed, resuming: {e}")
+            except PyMongoError as e:
+                print(f"[WARN] Change stream failed, resuming: {e}")
+            await asyncio.sleep(CHANGE_FEED_RETRY_SECONDS)
+
+    # === POLLING ===
+    async def _poll(self) -> None:
+        self.active_mode = "poll"
+        since = datetime.utcnow() - CHANGE_FEED_POLL_OVERLAP
+        projection = dict.fromkeys(INDEXED_FIELDS, 1)
+        while True:
+            await asyncio.sleep(CHANGE_FEED_POLL_SECONDS)
+            now = datetime.utcnow()
+            try:
+                stories = [story async for story in story_collection.find({"updated_at": {"$gt": since}}, projection)]
+                await self._load_content(story for story in stories if holds_story_audio(str(story["_id"])))
+                for story in stories:
+                    self.apply(str(story["_id"]), story)
+                async for tombstone in deleted_story_collection.find({"deleted_at": {"$gt": since}}):
+                    self.apply(tombstone["_id"], None)
+            except PyMongoError as e:
+                print(f"[WARN] Change polling failed: {e}")
+                continue
+            since = now - CHANGE_FEED_POLL_OVERLAP
+
+    async def _load_content(self, stories: Iterable[dict]) -> None:
+        # Polling can't tell which fields changed; content is fetched only where
+        # this node holds audio, so apply() can keep audio that is still current
+        by_id = {story["_id"]: story for story in stories}
+        if by_id:
+            async for doc in story_collection.find({"_id": {"$in": list(by_id)}}, {"content": 1}):
+                by_id[doc["_id"]]["content"] = doc.get("content", "")
+
+    async def _run(self) -> None:
+        if self.mode in ("auto", "stream"):
+            try:
+                await self._watch()
+            except OperationFailure as e:
+                if self.mode == "stream":
+                    print(f"[WARN] Change streams unavailable, cache coherence disabled: {e}")
+                    self.active_mode = None
+                    return
+                print("[WARN] Change streams need a replica set; polling for changes instead")
+        await self._poll()
+
+    # === LIFECYCLE ===
+    def start(self) -> None:
+        if self.mode == "off" or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self.active_mode = None
+
+    def stats(self) -> dict:
+        return {"mode": self.mode, "active_mode": self.active_mode, "applied": self.applied}
+
+
+change_feed = ChangeFeed()
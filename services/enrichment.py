@@ -0,0 +1,120 @@
+import os
+import asyncio
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from db.mongo import enrichment_collection, story_collection
+from services.audio_service import get_story_audio
+from services.story_cache import invalidate_story
+from services.story_pipeline import story_image
+from services.versions import bump_version
+
+# Background workers per app process filling in images and audio for imported stories
+ENRICHMENT_WORKERS = int(os.getenv("ENRICHMENT_WORKERS", "2"))
+ENRICHMENT_POLL_SECONDS = float(os.getenv("ENRICHMENT_POLL_SECONDS", "2"))
+# A claimed job whose worker died becomes claimable again after this long
+ENRICHMENT_LEASE_SECONDS = int(os.getenv("ENRICHMENT_LEASE_SECONDS", "300"))
+ENRICHMENT_MAX_ATTEMPTS = int(os.getenv("ENRICHMENT_MAX_ATTEMPTS", "5"))
+
+
+# === QUEUE ===
+async def enqueue(jobs: Iterable[dict]) -> None:
+    """Queue {"story_id", "tasks": ["image", "audio"], "base_url", "import_job"} entries."""
+    now = datetime.utcnow()
+    docs = [
+        {"_id": job["story_id"], "attempts": 0, "run_after": now, **{k: v for k, v in job.items() if k != "story_id"}}
+        for job in jobs if job["tasks"]
+    ]
+    if not docs:
+        return
+    try:
+        await enrichment_collection.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        # Re-queued on a resumed import; the existing entry stands
+        if any(error["code"] != 11000 for error in e.details["writeErrors"]):
+            raise
+
+async def _claim() -> Optional[dict]:
+    now = datetime.utcnow()
+    return await enrichment_collection.find_one_and_update(
+        {"run_after": {"$lte": now}, "attempts": {"$lt": ENRICHMENT_MAX_ATTEMPTS}},
+        {"$set": {"run_after": now + timedelta(seconds=ENRICHMENT_LEASE_SECONDS)}, "$inc": {"attempts": 1}},
+        sort=[("run_after", 1)],
+        return_document=ReturnDocument.AFTER
+    )
+
+async def pending(import_job: Optional[str] = None) -> int:
+    query = {"attempts": {"$lt": ENRICHMENT_MAX_ATTEMPTS}}
+    if import_job:
+        query["import_job"] = import_job
+    return await enrichment_collection.count_documents(query)
+
+
+# === TASKS ===
+async def _enrich(job: dict) -> List[str]:
+    """Run the job's remaining tasks; returns the ones still to do."""
+    story_id = job["_id"]
+    story = await story_collection.find_one(
+        {"_id": ObjectId(story_id)}, {"title": 1, "genre": 1, "theme": 1, "content": 1, "language": 1}
+    )
+    if not story:
+        return []
+    remaining = []
+    for task in job["tasks"]:
+        try:
+            if task == "image":
+                image = await story_image(story, job["base_url"])
+                await story_collection.update_one(
+                    {"_id": story["_id"]},
+                    {"$set": image, "$inc": {"version": 1}, "$currentDate": {"updated_at": True}}
+                )
+                # Lists show the image too, so their ETags must move along with the story's
+                await bump_version()
+                invalidate_story(story_id)
+            elif task == "audio":
+                await get_story_audio(story_id, story["content"], story.get("language", "english"))
+        except Exception as e:
+            print(f"[WARN] Enrichment {task} failed for {story_id}: {e}")
+            remaining.append(task)
+    return remaining
+
+async def _worker() -> None:
+    while True:
+        try:
+            job = await _claim()
+        except PyMongoError as e:
+            print(f"[WARN] Enrichment queue unavailable: {e}")
+            job = None
+        if job is None:
+            await asyncio.sleep(ENRICHMENT_POLL_SECONDS)
+            continue
+        try:
+            remaining = await _enrich(job)
+            if remaining:
+                # Retried once the lease runs out, up to ENRICHMENT_MAX_ATTEMPTS
+                await enrichment_collection.update_one({"_id": job["_id"]}, {"$set": {"tasks": remaining}})
+            else:
+                await enrichment_collection.delete_one({"_id": job["_id"]})
+        except Exception as e:
+            # The lease still runs out, so the job is retried like a failed task
+            print(f"[WARN] Enrichment job {job['_id']} failed: {e}")
+
+
+# === LIFECYCLE ===
+_workers: List[asyncio.Task] = []
+
+def start_workers() -> None:
+    if _workers:
+        return
+    for _ in range(ENRICHMENT_WORKERS):
+        _workers.append(asyncio.create_task(_worker()))
+
+async def stop_workers() -> None:
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
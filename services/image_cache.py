@@ -0,0 +1,147 @@
+import os
+import re
+import random
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+from cachetools import LRUCache
+
+from db.mongo import image_cache_collection
+
+# Results younger than the TTL are served as is; older ones (up to the stale TTL)
+# are served while a background refresh runs
+IMAGE_CACHE_TTL = int(os.getenv("IMAGE_CACHE_TTL", str(24 * 3600)))
+IMAGE_CACHE_STALE_TTL = int(os.getenv("IMAGE_CACHE_STALE_TTL", str(30 * 24 * 3600)))
+# Queries Unsplash has no photo for are remembered this long, so they don't spend quota on every lookup
+IMAGE_CACHE_MISS_TTL = int(os.getenv("IMAGE_CACHE_MISS_TTL", str(6 * 3600)))
+IMAGE_CACHE_SIZE = int(os.getenv("IMAGE_CACHE_SIZE", "1024"))
+# How many images to keep per query, for variety between stories
+IMAGE_POOL_SIZE = int(os.getenv("IMAGE_POOL_SIZE", "5"))
+
+UNSPLASH_SEARCH_URL = "https://api.unsplash.com/search/photos"
+
+_memory: LRUCache = LRUCache(maxsize=IMAGE_CACHE_SIZE)  # key -> (urls, fetched_at)
+_refreshing: Dict[str, asyncio.Task] = {}
+_quota = {"limit": None, "remaining": None, "blocked_until": None}
+_stats = {"memory_hits": 0, "mongo_hits": 0, "stale_served": 0, "misses_served": 0, "api_calls": 0, "quota_skips": 0}
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def normalize_query(*parts: str) -> str:
+    """Lowercase, de-duplicated, order-independent form of a search query."""
+    words = {w for part in parts if part for w in _WORD_RE.findall(part.lower())}
+    return " ".join(sorted(words)) or "story"
+
+
+# === QUOTA ===
+def _quota_exhausted() -> bool:
+    blocked_until = _quota["blocked_until"]
+    if blocked_until and datetime.utcnow() < blocked_until:
+        return True
+    _quota["blocked_until"] = None
+    return False
+
+def _record_quota(headers: httpx.Headers) -> None:
+    try:
+        _quota["limit"] = int(headers.get("X-Ratelimit-Limit", _quota["limit"]))
+        _quota["remaining"] = int(headers.get("X-Ratelimit-Remaining", _quota["remaining"]))
+    except (TypeError, ValueError):
+        return
+    if _quota["remaining"] is not None and _quota["remaining"] <= 0:
+        # Unsplash quotas are hourly; stop calling until the next hour starts
+        now = datetime.utcnow()
+        _quota["blocked_until"] = now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+
+
+# === UNSPLASH ===
+async def _search_unsplash(query: str, access_key: str) -> List[str]:
+    headers = {"Authorization": f"Client-ID {access_key}"}
+    params = {"query": query, "per_page": IMAGE_POOL_SIZE, "orientation": "landscape"}
+    _stats["api_calls"] += 1
+    async with httpx.AsyncClient(timeout=10) as client:
+        response = await client.get(UNSPLASH_SEARCH_URL, headers=headers, params=params)
+    _record_quota(response.headers)
+    response.raise_for_status()
+    return [r["urls"]["regular"] for r in response.json().get("results", [])]
+
+async def _refresh(key: str, access_key: str) -> List[str]:
+    if _quota_exhausted():
+        _stats["quota_skips"] += 1
+        return []
+    urls = await _search_unsplash(key, access_key)
+    # An empty answer is cached too, for IMAGE_CACHE_MISS_TTL instead of IMAGE_CACHE_TTL
+    fetched_at = datetime.utcnow()
+    _memory[key] = (urls, fetched_at)
+    await image_cache_collection.replace_one(
+        {"_id": key}, {"urls": urls, "fetched_at": fetched_at}, upsert=True
+    )
+    return urls
+
+def _refresh_coalesced(key: str, access_key: str) -> asyncio.Task:
+    task = _refreshing.get(key)
+    if task is None:
+        task = asyncio.create_task(_refresh(key, access_key))
+        _refreshing[key] = task
+
+        def _done(t: asyncio.Task) -> None:
+            _refreshing.pop(key, None)
+            if not t.cancelled() and t.exception() is not None:
+                print(f"[WARN] Image lookup failed for '{key}': {t.exception()}")
+
+        task.add_done_callback(_done)
+    return task
+
+
+# === LOOKUP ===
+async def _cached(key: str) -> Optional[Tuple[List[str], datetime]]:
+    entry = _memory.get(key)
+    if entry is not None:
+        _stats["memory_hits"] += 1
+        return entry
+    doc = await image_cache_collection.find_one({"_id": key})
+    if doc:
+        _stats["mongo_hits"] += 1
+        entry = (doc["urls"], doc["fetched_at"])
+        _memory[key] = entry
+        return entry
+    return None
+
+async def lookup_image(query: str, access_key: str) -> Optional[str]:
+    """Return an image URL for `query`, or None if nothing is cached and Unsplash can't be asked."""
+    key = normalize_query(query)
+    entry = await _cached(key)
+    if entry is not None:
+        urls, fetched_at = entry
+        age = (datetime.utcnow() - fetched_at).total_seconds()
+        if not urls:
+            if age < IMAGE_CACHE_MISS_TTL:
+                _stats["misses_served"] += 1
+                return None
+        elif age < IMAGE_CACHE_STALE_TTL:
+            if age >= IMAGE_CACHE_TTL:
+                _stats["stale_served"] += 1
+                _refresh_coalesced(key, access_key)
+            return random.choice(urls)
+
+    try:
+        urls = await asyncio.shield(_refresh_coalesced(key, access_key))
+    except Exception:
+        urls = []
+    if not urls and entry is not None:
+        # Very old results still beat a placeholder while Unsplash is unavailable
+        urls = entry[0]
+    return random.choice(urls) if urls else None
+
+def image_cache_stats() -> dict:
+    return {
+        **_stats,
+        "memory_entries": len(_memory),
+        "quota": {
+            "limit": _quota["limit"],
+            "remaining": _quota["remaining"],
+            "blocked_until": _quota["blocked_until"].isoformat() + "Z" if _quota["blocked_until"] else None,
+        },
+    }
@@ -0,0 +1,154 @@
+import os
+import re
+import json
+import base64
+import shutil
+import asyncio
+import hashlib
+import tempfile
+from io import BytesIO
+from functools import partial
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+import httpx
+from PIL import Image, ImageOps
+
+# Local copies of story images are served from the /static mount
+STATIC_DIR = "static"
+IMAGE_DIR = os.path.join(STATIC_DIR, "images")
+IMAGE_MAX_DOWNLOAD_BYTES = int(os.getenv("IMAGE_MAX_DOWNLOAD_BYTES", str(15 * 1024 * 1024)))
+
+# Variant name -> max width/height in pixels
+IMAGE_VARIANTS = {"thumb": 320, "card": 800, "full": 1600}
+IMAGE_FORMATS = {"webp": ("WEBP", {"quality": 80, "method": 4}), "jpg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True})}
+PLACEHOLDER_SIZE = 16
+
+# Top and bottom colours of the gradient shown when a story has no image
+GENRE_GRADIENTS = {
+    "fantasy": ((76, 29, 149), (236, 72, 153)),
+    "sci-fi": ((30, 27, 75), (14, 165, 233)),
+    "mystery": ((15, 23, 42), (100, 116, 139)),
+    "adventure": ((234, 88, 12), (250, 204, 21)),
+    "horror": ((10, 10, 10), (127, 29, 29)),
+    "romance": ((244, 63, 94), (251, 207, 232)),
+}
+DEFAULT_GRADIENT = ((55, 65, 81), (156, 163, 175))
+
+_inflight: Dict[str, asyncio.Task] = {}
+
+
+# === RENDERING (runs in a worker thread) ===
+def _write_variants(img: Image.Image, directory: str) -> str:
+    """Write every variant of `img` into `directory`; returns the inline placeholder."""
+    staging = tempfile.mkdtemp(prefix=".tmp-", dir=os.path.dirname(directory))
+    try:
+        for name, size in IMAGE_VARIANTS.items():
+            variant = img.copy()
+            variant.thumbnail((size, size), Image.LANCZOS)
+            for ext, (fmt, options) in IMAGE_FORMATS.items():
+                variant.save(os.path.join(staging, f"{name}.{ext}"), fmt, **options)
+
+        preview = img.copy()
+        preview.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+        buffer = BytesIO()
+        preview.save(buffer, "JPEG", quality=50)
+        placeholder = "data:image/jpeg;base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
+        with open(os.path.join(staging, "manifest.json"), "w") as f:
+            json.dump({"placeholder": placeholder}, f)
+
+        # Publish all variants at once so readers never see a half-written set
+        os.replace(staging, directory)
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        # Losing the rename race to another worker is fine
+        existing = _load_placeholder(directory)
+        if existing is None:
+            raise
+        return existing
+    return placeholder
+
+def _render_photo(data: bytes, directory: str) -> str:
+    with Image.open(BytesIO(data)) as img:
+        return _write_variants(ImageOps.exif_transpose(img).convert("RGB"), directory)
+
+def _render_gradient(colors: Tuple[Tuple[int, int, int], Tuple[int, int, int]], directory: str) -> str:
+    size = (IMAGE_VARIANTS["full"], IMAGE_VARIANTS["full"] * 9 // 16)
+    top, bottom = colors
+    mask = Image.linear_gradient("L").resize(size)
+    img = Image.composite(Image.new("RGB", size, bottom), Image.new("RGB", size, top), mask)
+    return _write_variants(img, directory)
+
+
+# === PUBLIC API ===
+def _describe(key: str, base_url: str, placeholder: Optional[str]) -> dict:
+    prefix = f"{base_url.rstrip('/')}/static/images/{key}"
+    variants = {
+        name: {ext: f"{prefix}/{name}.{ext}" for ext in IMAGE_FORMATS}
+        for name in IMAGE_VARIANTS
+    }
+    return {
+        "image_url": variants["card"]["jpg"],
+        "image_variants": variants,
+        "image_placeholder": placeholder,
+    }
+
+def _load_placeholder(directory: str) -> Optional[str]:
+    try:
+        with open(os.path.join(directory, "manifest.json")) as f:
+            return json.load(f)["placeholder"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+async def _download(url: str) -> bytes:
+    async with httpx.AsyncClient(timeout=10, follow_redirects=True) as client:
+        async with client.stream("GET", url) as response:
+            response.raise_for_status()
+            data = bytearray()
+            async for chunk in response.aiter_bytes():
+                data += chunk
+                if len(data) > IMAGE_MAX_DOWNLOAD_BYTES:
+                    raise ValueError(f"Image larger than {IMAGE_MAX_DOWNLOAD_BYTES} bytes")
+    return bytes(data)
+
+async def _materialize(key: str, render: Callable[..., str], load: Optional[Callable[[], Awaitable[bytes]]] = None) -> str:
+    directory = os.path.join(IMAGE_DIR, key)
+    placeholder = _load_placeholder(directory)
+    if placeholder is not None:
+        return placeholder
+
+    task = _inflight.get(key)
+    if task is None:
+        async def _build() -> str:
+            os.makedirs(IMAGE_DIR, exist_ok=True)
+            args = (await load(),) if load else ()
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, render, *args, directory)
+
+        task = asyncio.create_task(_build())
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    return await asyncio.shield(task)
+
+async def proxy_image(url: str, base_url: str) -> dict:
+    """Fetch a remote image once and serve resized local variants of it."""
+    key = hashlib.sha1(url.encode("utf-8")).hexdigest()[:20]
+    placeholder = await _materialize(key, _render_photo, lambda: _download(url))
+    return _describe(key, base_url, placeholder)
+
+async def genre_placeholder(genre: str, base_url: str) -> dict:
+    """Gradient artwork for stories without an image, one per known genre."""
+    slug = re.sub(r"[^a-z0-9]+", "-", genre.lower()).strip("-")
+    # Genres are free text; every unknown one shares the default artwork instead of a copy each
+    if slug not in GENRE_GRADIENTS:
+        slug = "default"
+    colors = GENRE_GRADIENTS.get(slug, DEFAULT_GRADIENT)
+    placeholder = await _materialize(f"genre-{slug}", partial(_render_gradient, colors))
+    return _describe(f"genre-{slug}", base_url, placeholder)
+
+async def ensure_default_artwork() -> None:
+    """Render the default artwork up front so `default_artwork` always points at real files."""
+    await _materialize("genre-default", partial(_render_gradient, DEFAULT_GRADIENT))
+
+def default_artwork(base_url: str) -> dict:
+    """The default genre artwork, for when a story's own image could not be produced at all."""
+    return _describe("genre-default", base_url, _load_placeholder(os.path.join(IMAGE_DIR, "genre-default")))
@@ -0,0 +1,136 @@
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from bson import ObjectId
+from pymongo import DeleteOne, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from db.mongo import library_collection, story_collection
+from services.user_stats import record_bookmark, record_bookmarks_removed
+from services.versions import bump_version
+from services.write_buffer import write_buffer
+
+
+async def add_bookmark(user_id: str, story_id: str) -> Optional[bool]:
+    """Add a story to a user's library.
+
+    Returns True if added, False if it was already there, None if the story doesn't exist.
+    """
+    oid = ObjectId(story_id)
+    if not await story_collection.count_documents({"_id": oid}, limit=1):
+        return None
+    try:
+        entry = {"user_id": user_id, "story_id": oid, "created_at": datetime.utcnow()}
+        await write_buffer.insert_one(library_collection, entry)
+    except DuplicateKeyError:
+        return False
+    await write_buffer.update_one(
+        story_collection, {"_id": oid}, {"$inc": {"bookmark_count": 1, "version": 1}, "$currentDate": {"updated_at": True}}
+    )
+    await record_bookmark(user_id, 1)
+    await bump_version()
+    return True
+
+async def remove_bookmark(user_id: str, story_id: str) -> Optional[bool]:
+    """Remove a story from a user's library; same return values as add_bookmark."""
+    oid = ObjectId(story_id)
+    result = await library_collection.delete_one({"user_id": user_id, "story_id": oid})
+    if result.deleted_count == 0:
+        if not await story_collection.count_documents({"_id": oid}, limit=1):
+            return None
+        return False
+    await write_buffer.update_one(
+        story_collection, {"_id": oid}, {"$inc": {"bookmark_count": -1, "version": 1}, "$currentDate": {"updated_at": True}}
+    )
+    await record_bookmark(user_id, -1)
+    await bump_version()
+    return True
+
+async def apply_bookmarks(user_id: str, operations: List[Tuple[str, str]]) -> Dict[str, List[str]]:
+    """Apply many ("add" | "remove", story_id) operations with one library bulk_write.
+
+    The last operation on a story wins. Returns the story ids that were
+    added, removed, already in the requested state (unchanged) or that
+    don't exist (missing).
+    """
+    wanted: Dict[str, str] = {}
+    for action, story_id in operations:
+        wanted[story_id] = action
+    outcome = {"added": [], "removed": [], "unchanged": [], "missing": []}
+
+    valid = [story_id for story_id in wanted if ObjectId.is_valid(story_id)]
+    existing = {
+        str(story["_id"])
+        async for story in story_collection.find({"_id": {"$in": [ObjectId(i) for i in valid]}}, {"_id": 1})
+    }
+    present = await bookmarked_ids(user_id, existing)
+    now = datetime.utcnow()
+    requests, changed = [], []
+    for story_id, action in wanted.items():
+        if story_id not in existing:
+            outcome["missing"].append(story_id)
+        elif (action == "add") == (story_id in present):
+            outcome["unchanged"].append(story_id)
+        elif action == "add":
+            # Upsert rather than insert, so a concurrent single add can't fail the batch
+            requests.append(UpdateOne(
+                {"user_id": user_id, "story_id": ObjectId(story_id)},
+                {"$setOnInsert": {"created_at": now}},
+                upsert=True
+            ))
+            changed.append(story_id)
+        else:
+            requests.append(DeleteOne({"user_id": user_id, "story_id": ObjectId(story_id)}))
+            changed.append(story_id)
+    if not requests:
+        return outcome
+
+    result = await library_collection.bulk_write(requests, ordered=False)
+    # Upserts report exactly which adds took effect; deletes only report a count
+    upserted = {changed[i] for i in result.upserted_ids}
+    for story_id, request in zip(changed, requests):
+        if isinstance(request, DeleteOne):
+            outcome["removed"].append(story_id)
+        elif story_id in upserted:
+            outcome["added"].append(story_id)
+        else:
+            outcome["unchanged"].append(story_id)
+
+    counts = [
+        UpdateOne(
+            {"_id": ObjectId(story_id)},
+            {"$inc": {"bookmark_count": delta, "version": 1}, "$currentDate": {"updated_at": True}}
+        )
+        for delta, ids in ((1, outcome["added"]), (-1, outcome["removed"]))
+        for story_id in ids
+    ]
+    if counts:
+        await story_collection.bulk_write(counts, ordered=False)
+        # Removes are counted per story even if a concurrent request got there first (rare,
+        # and bookmark_count is a display figure); the user's counter uses the exact count
+        await record_bookmark(user_id, len(outcome["added"]) - result.deleted_count)
+        await bump_version()
+    return outcome
+
+async def bookmarked_ids(user_id: str, story_ids: Iterable[str]) -> Set[str]:
+    """Which of `story_ids` the user has bookmarked, in one $in query."""
+    oids = [ObjectId(i) for i in story_ids]
+    if not oids:
+        return set()
+    cursor = library_collection.find({"user_id": user_id, "story_id": {"$in": oids}}, {"story_id": 1})
+    return {str(entry["story_id"]) async for entry in cursor}
+
+async def remove_story_from_libraries(story_id: str) -> None:
+    oid = ObjectId(story_id)
+    user_ids = await library_collection.distinct("user_id", {"story_id": oid})
+    if user_ids:
+        await library_collection.delete_many({"story_id": oid})
+        await record_bookmarks_removed(user_ids)
+
+def library_page(user_id: str, after: Optional[dict], limit: Optional[int]):
+    """Cursor over a user's library entries, most recently bookmarked first."""
+    query = {"user_id": user_id}
+    if after:
+        query = {"$and": [query, after]}
+    cursor = library_collection.find(query, {"story_id": 1, "created_at": 1}).sort([("created_at", -1), ("_id", -1)])
+    return cursor.limit(limit) if limit else cursor
@@ -0,0 +1,114 @@
+import re
+import sys
+import time
+import random
+import asyncio
+from typing import List, Optional
+
+MAX_QUERY_CHARS = 200
+MAX_QUERY_TERMS = 12
+
+_PHRASE_RE = re.compile(r'"([^"]*)"')
+_WORD_RE = re.compile(r"\w+")
+
+
+def parse_search_query(q: str) -> str:
+    """Turn user input into a safe $text search string.
+
+    Only words and "quoted phrases" survive; negations, stray quotes and
+    other operators are dropped, and overly long queries are truncated.
+    """
+    q = q[:MAX_QUERY_CHARS]
+    phrases = [" ".join(_WORD_RE.findall(p)) for p in _PHRASE_RE.findall(q)]
+    words = _WORD_RE.findall(_PHRASE_RE.sub(" ", q))
+    terms = [f'"{p}"' for p in phrases if p] + words
+    return " ".join(terms[:MAX_QUERY_TERMS])
+
+def search_pipeline(
+    text: str,
+    genre: Optional[str] = None,
+    language: Optional[str] = None,
+    after: Optional[dict] = None,
+    projection: Optional[dict] = None,
+    limit: Optional[int] = None
+) -> List[dict]:
+    """Aggregation returning stories matching `text`, most relevant first.
+
+    `after` is a keyset filter on (score, _id) that resumes after a previous page.
+    """
+    match = {"$text": {"$search": text}}
+    if genre:
+        match["genre"] = genre
+    if language:
+        match["language"] = language.lower()
+
+    pipeline = [
+        {"$match": match},
+        {"$addFields": {"score": {"$meta": "textScore"}}},
+    ]
+    if after:
+        pipeline.append({"$match": after})
+    pipeline.append({"$sort": {"score": -1, "_id": -1}})
+    if limit:
+        pipeline.append({"$limit": limit})
+    if projection:
+        # An inclusion projection has to name score to keep it; an exclusion keeps it anyway
+        inclusion = any(value for key, value in projection.items() if key != "_id")
+        pipeline.append({"$project": {**projection, "score": 1} if inclusion else projection})
+    return pipeline
+
+
+# === BENCHMARK ===
+_BENCH_WORDS = (
+    "kingdom dragon forest castle river storm night knight witch ocean mountain shadow "
+    "lantern village secret crown mirror garden winter wolf star bridge tower song"
+).split()
+
+async def _count(cursor) -> int:
+    return len([doc async for doc in cursor])
+
+async def _bench(count: int, rounds: int) -> None:
+    from db.indexes import INDEXES
+    from db.mongo import db
+
+    collection = db["search_bench"]
+    await collection.drop()
+    rng = random.Random(0)
+
+    def words(n: int) -> str:
+        return " ".join(rng.choice(_BENCH_WORDS) for _ in range(n))
+
+    async def run(label: str, query) -> None:
+        best, found = float("inf"), 0
+        for _ in range(rounds):
+            start = time.perf_counter()
+            found = await _count(query())
+            best = min(best, time.perf_counter() - start)
+        print(f"{label}: {best * 1000:.1f} ms, {found} results")
+
+    try:
+        docs = [
+            {"title": words(4).title(), "theme": words(6), "content": words(300), "genre": "Fantasy", "language": "english"}
+            for _ in range(count)
+        ]
+        for start in range(0, count, 1000):
+            await collection.insert_many(docs[start:start + 1000])
+        await collection.create_indexes([i for i in INDEXES["stories"] if i.document["name"] == "story_text"])
+        print(f"{count} stories, best of {rounds}")
+        for term in ("kingdom", "dragon castle"):
+            # The old /search_stories: unanchored case-insensitive regex, every match returned
+            regex = {"$or": [
+                {"title": {"$regex": term, "$options": "i"}},
+                {"theme": {"$regex": term, "$options": "i"}},
+            ]}
+            text = parse_search_query(term)
+            await run(f"regex '{term}', all matches", lambda: collection.find(regex))
+            await run(f"$text '{term}', all matches", lambda: collection.aggregate(search_pipeline(text)))
+            await run(f"$text '{term}', first page", lambda: collection.aggregate(search_pipeline(text, limit=21)))
+    finally:
+        await collection.drop()
+
+if __name__ == "__main__":
+    # python -m services.search [stories] [rounds]
+    args = [int(a) for a in sys.argv[1:3]]
+    asyncio.run(_bench(*(args + [20000, 5][len(args):])))
@@ -0,0 +1,103 @@
+import os
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set
+
+from cachetools import TTLCache
+
+# Per-worker cache of hot story documents; invalidated locally on writes, so the
+# TTL only bounds staleness from writes handled by other workers
+STORY_CACHE_TTL = float(os.getenv("STORY_CACHE_TTL", "5"))
+STORY_CACHE_SIZE = int(os.getenv("STORY_CACHE_SIZE", "2048"))
+# Microcache for rendered list pages; 0 disables it
+LIST_MICROCACHE_TTL = float(os.getenv("LIST_MICROCACHE_TTL", "0"))
+LIST_MICROCACHE_SIZE = int(os.getenv("LIST_MICROCACHE_SIZE", "512"))
+
+
+class ReadThroughCache:
+    """TTL cache that loads misses itself, one load per key however many callers wait.
+
+    A load still in flight when its key is invalidated is handed to its
+    waiters but not stored.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.enabled = ttl > 0 and maxsize > 0
+        self._cache: TTLCache = TTLCache(maxsize=max(maxsize, 1), ttl=max(ttl, 0.001))
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._stale: Set[asyncio.Task] = set()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def _count(self, route: str, outcome: str) -> None:
+        counters = self._stats.setdefault(route, {"hits": 0, "misses": 0, "coalesced": 0})
+        counters[outcome] += 1
+
+    async def get(self, key: Hashable, load: Callable[[], Awaitable[Any]], route: str) -> Any:
+        if not self.enabled:
+            self._count(route, "misses")
+            return await load()
+        try:
+            value = self._cache[key]
+            self._count(route, "hits")
+            return value
+        except KeyError:
+            pass
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self._count(route, "coalesced")
+        else:
+            self._count(route, "misses")
+            task = asyncio.create_task(load())
+            self._inflight[key] = task
+
+            def _store(t: asyncio.Task, key=key) -> None:
+                if self._inflight.get(key) is t:
+                    del self._inflight[key]
+                if t in self._stale:
+                    self._stale.discard(t)
+                elif not t.cancelled() and t.exception() is None and t.result() is not None:
+                    self._cache[key] = t.result()
+
+            task.add_done_callback(_store)
+        # A caller that gives up must not cancel the load for everyone else
+        return await asyncio.shield(task)
+
+    def invalidate(self, key: Hashable) -> None:
+        self._cache.pop(key, None)
+        task = self._inflight.pop(key, None)
+        if task is not None:
+            self._stale.add(task)
+
+    def clear(self) -> None:
+        self._cache.clear()
+        self._stale.update(self._inflight.values())
+        self._inflight.clear()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        report = {}
+        for route, counters in self._stats.items():
+            total = counters["hits"] + counters["misses"] + counters["coalesced"]
+            # Coalesced callers skipped the database too
+            served = counters["hits"] + counters["coalesced"]
+            report[route] = {**counters, "hit_rate": round(served / total, 4) if total else 0.0}
+        return report
+
+
+story_cache = ReadThroughCache(STORY_CACHE_SIZE, STORY_CACHE_TTL)
+list_cache = ReadThroughCache(LIST_MICROCACHE_SIZE, LIST_MICROCACHE_TTL)
+
+
+def invalidate_story(story_id: Optional[str] = None) -> None:
+    """Call after a story write: drops the story and every microcached list page."""
+    if story_id:
+        story_cache.invalidate(story_id)
+    list_cache.clear()
+
+def cache_stats() -> Dict[str, Any]:
+    return {
+        "story": {"ttl": STORY_CACHE_TTL, "size": len(story_cache), "routes": story_cache.stats()},
+        "lists": {"ttl": LIST_MICROCACHE_TTL, "size": len(list_cache), "routes": list_cache.stats()},
+    }
@@ -0,0 +1,249 @@
+import os
+import sys
+import asyncio
+from datetime import datetime
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+import orjson
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+from db.mongo import import_job_collection, story_collection
+from services.audio_service import should_prefetch
+from services.enrichment import enqueue
+from services.image_proxy import default_artwork, genre_placeholder
+from services.story_cache import invalidate_story
+from services.story_pipeline import story_document
+from services.trigram_index import story_index
+from services.user_stats import record_stories_created
+from services.versions import bump_version
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+# Longer lines are skipped as they stream in and reported as invalid, so memory stays bounded
+MAX_LINE_BYTES = int(os.getenv("IMPORT_MAX_LINE_BYTES", str(1024 * 1024)))
+MAX_REPORTED_ERRORS = 20
+
+_COUNTERS = ("lines", "inserted", "duplicates", "invalid", "failed")
+
+
+# Yielded by iter_lines in place of a line over MAX_LINE_BYTES
+LINE_TOO_LONG = object()
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_line_bytes: int = MAX_LINE_BYTES) -> AsyncIterator[bytes]:
+    """Split a byte stream into lines without holding more than one partial line.
+
+    A line over `max_line_bytes` is dropped while it streams in and yielded
+    as LINE_TOO_LONG, so line numbers stay right.
+    """
+    pending = b""
+    overflow = False
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            if overflow:
+                overflow = False  # This is the end of the oversized line
+                yield LINE_TOO_LONG
+            elif len(line) > max_line_bytes:
+                yield LINE_TOO_LONG
+            else:
+                yield line
+        if len(pending) > max_line_bytes:
+            overflow = True
+            pending = b""
+    if overflow or len(pending) > max_line_bytes:
+        yield LINE_TOO_LONG
+    elif pending:
+        yield pending
+
+async def _load_job(job_id: Optional[str]) -> dict:
+    if job_id:
+        job = await import_job_collection.find_one({"_id": job_id})
+        if job:
+            return job
+    job = {
+        "_id": job_id or str(ObjectId()),
+        "status": "running",
+        "lines_done": 0,
+        **dict.fromkeys(_COUNTERS, 0),
+        "errors": [],
+        "started_at": datetime.utcnow(),
+    }
+    await import_job_collection.insert_one(job)
+    return job
+
+async def get_import_job(job_id: str) -> Optional[dict]:
+    return await import_job_collection.find_one({"_id": job_id})
+
+
+class StoryImport:
+    """Imports NDJSON story records in batches, resumable by job id.
+
+    Each record becomes a story right away with genre artwork; image
+    lookup and audio are queued for the enrichment workers. Progress is
+    saved after every batch as the number of input lines fully handled, so
+    re-sending the same input with the same job id skips what is done.
+    Records also carry an import_ref (job id and line), which a unique
+    index uses to reject any line written twice.
+    """
+
+    def __init__(self, job: dict, validate: Callable[[dict], dict], base_url: str):
+        self.job = job
+        self.validate = validate
+        self.base_url = base_url
+        self._batch: List[dict] = []
+        self._placeholders: Dict[str, dict] = {}
+
+    @property
+    def job_id(self) -> str:
+        return self.job["_id"]
+
+    def _error(self, line_no: int, error: str) -> None:
+        self.job["invalid"] += 1
+        if len(self.job["errors"]) < MAX_REPORTED_ERRORS:
+            self.job["errors"].append({"line": line_no, "error": error[:300]})
+
+    async def _placeholder(self, genre: str) -> dict:
+        # Genre artwork until enrichment finds a photo, and for good if it never does
+        image = self._placeholders.get(genre)
+        if image is None:
+            try:
+                image = await genre_placeholder(genre, self.base_url)
+            except Exception as e:
+                print(f"[WARN] Genre artwork failed for '{genre}': {e}")
+                image = default_artwork(self.base_url)
+            self._placeholders[genre] = image
+        return image
+
+    async def _document(self, fields: dict, line_no: int) -> dict:
+        story_id = str(ObjectId())
+        audio_url = f"{self.base_url}story_audio/{story_id}"
+        created_at = datetime.utcnow().isoformat() + "Z"
+        image = await self._placeholder(fields["genre"])
+        doc = story_document(fields, story_id, fields["title"], fields["content"], audio_url, image, created_at)
+        doc["import_ref"] = f"{self.job_id}:{line_no}"
+        return doc
+
+    async def run(self, lines: AsyncIterator[bytes]) -> dict:
+        skip = self.job["lines_done"]
+        line_no = 0
+        async for raw in lines:
+            line_no += 1
+            if line_no <= skip:
+                continue
+            self.job["lines"] += 1
+            if raw is LINE_TOO_LONG:
+                self._error(line_no, f"Line is longer than {MAX_LINE_BYTES} bytes")
+                continue
+            raw = raw.strip()
+            if not raw:
+                continue
+            try:
+                fields = self.validate(orjson.loads(raw))
+            except (ValueError, TypeError) as e:  # Bad JSON, a non-object record or failed validation
+                self._error(line_no, str(e))
+                continue
+            self._batch.append(await self._document(fields, line_no))
+            if len(self._batch) >= IMPORT_BATCH_SIZE:
+                await self._flush(line_no)
+        await self._flush(line_no, done=True)
+        return self.job
+
+    async def _flush(self, line_no: int, done: bool = False) -> None:
+        docs, self._batch = self._batch, []
+        written = docs
+        if docs:
+            try:
+                await story_collection.insert_many(docs, ordered=False)
+            except BulkWriteError as e:
+                errors = e.details["writeErrors"]
+                failed = {error["index"] for error in errors}
+                duplicates = sum(error["code"] == 11000 for error in errors)
+                self.job["duplicates"] += duplicates
+                self.job["failed"] += len(failed) - duplicates
+                written = [doc for i, doc in enumerate(docs) if i not in failed]
+            self.job["inserted"] += len(written)
+            await self._after_insert(written)
+
+        self.job["lines_done"] = max(line_no, self.job["lines_done"])
+        if done:
+            self.job["status"] = "done"
+        await import_job_collection.update_one(
+            {"_id": self.job_id},
+            {"$set": {
+                "status": self.job["status"],
+                "lines_done": self.job["lines_done"],
+                **{counter: self.job[counter] for counter in _COUNTERS},
+                "errors": self.job["errors"],
+                "updated_at": datetime.utcnow(),
+            }}
+        )
+        print(
+            f"[IMPORT] {self.job_id}: line {self.job['lines_done']}, inserted {self.job['inserted']}, "
+            f"duplicates {self.job['duplicates']}, invalid {self.job['invalid']}, failed {self.job['failed']}"
+        )
+
+    async def _after_insert(self, docs: List[dict]) -> None:
+        if not docs:
+            return
+        counts: Dict[Tuple[str, str], int] = {}
+        for doc in docs:
+            key = (doc["user_id"], doc["status"])
+            counts[key] = counts.get(key, 0) + 1
+            story_index.add(doc)
+        await record_stories_created(counts)
+        await bump_version()
+        invalidate_story()
+        await enqueue(
+            {
+                "story_id": str(doc["_id"]),
+                # Audio only where new stories get it anyway; otherwise it stays lazy
+                "tasks": ["image", "audio"] if should_prefetch(doc["status"]) else ["image"],
+                "base_url": self.base_url,
+                "import_job": self.job_id,
+            }
+            for doc in docs
+        )
+
+
+async def import_stories(
+    lines: AsyncIterator[bytes], validate: Callable[[dict], dict], base_url: str, job_id: Optional[str] = None
+) -> dict:
+    """Import NDJSON records; pass the job id of an interrupted import to resume it."""
+    job = await _load_job(job_id)
+    if job["status"] == "done":
+        return job
+    return await StoryImport(job, validate, base_url).run(lines)
+
+
+async def _file_chunks(path: str, size: int = 64 * 1024) -> AsyncIterator[bytes]:
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(size)
+            if not chunk:
+                return
+            yield chunk
+
+async def _main(args: List[str]) -> int:
+    if not args or len(args) > 2:
+        print("Usage: python -m services.story_import FILE.ndjson [JOB_ID]")
+        return 2
+    from api.routes import validate_manual_story
+
+    base_url = os.getenv("PUBLIC_BASE_URL", "http://localhost:8000/")
+    job_id = args[1] if len(args) > 1 else None
+    job = await import_stories(
+        iter_lines(_file_chunks(args[0])),
+        validate_manual_story,
+        base_url.rstrip("/") + "/",
+        job_id
+    )
+    print(f"Import {job['_id']} {job['status']}; resume with: python -m services.story_import {args[0]} {job['_id']}")
+    print("Images and audio are filled in by the app's enrichment workers")
+    for error in job["errors"]:
+        print(f"  line {error['line']}: {error['error']}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main(sys.argv[1:])))
@@ -0,0 +1,334 @@
+import os
+import time
+import asyncio
+from datetime import datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from bson import ObjectId
+
+from services.story_service import (
+    LANGUAGE_CODES,
+    stream_ai_story,
+    generate_story_title,
+    find_image_url,
+    story_summary_fields
+)
+from services.image_proxy import proxy_image, genre_placeholder, default_artwork
+from services.audio_segments import split_segments, synthesize_segments
+from services.audio_service import schedule_prefetch, should_prefetch
+from services.user_stats import record_story_created
+from services.versions import bump_version
+from services.write_buffer import write_buffer
+from db.mongo import story_collection
+
+# Max chunks buffered between the LLM stream and each downstream stage
+PIPELINE_BUFFER = int(os.getenv("PIPELINE_BUFFER", "64"))
+# Max sentences synthesized at once while the story is still being written
+PIPELINE_TTS_CONCURRENCY = int(os.getenv("PIPELINE_TTS_CONCURRENCY", "4"))
+
+_END = object()
+_background: Set[asyncio.Task] = set()
+
+
+class _Branch:
+    """Bounded buffer feeding one downstream stage from the token stream.
+
+    A stage that has seen enough input closes its branch; the producer then
+    stops feeding it instead of blocking on a queue nobody reads.
+    """
+
+    def __init__(self, size: int = PIPELINE_BUFFER):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=size)
+        self.closed = False
+
+    async def put(self, item) -> None:
+        if not self.closed:
+            await self.queue.put(item)
+
+    def close(self) -> None:
+        self.closed = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        while True:
+            item = await self.queue.get()
+            if item is _END:
+                return
+            yield item
+
+
+# === STAGE ADAPTERS ===
+async def iter_sentences(chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+    """Re-chunk streamed text into the same segments split_segments() gives for the full text."""
+    paragraph = ""
+    emitted = 0
+    async for chunk in chunks:
+        paragraph += chunk
+        while "\n" in paragraph:
+            done, paragraph = paragraph.split("\n", 1)
+            for segment in split_segments(done)[emitted:]:
+                yield segment
+            emitted = 0
+        # The last segment may still be growing; only emit the ones before it
+        segments = split_segments(paragraph)
+        for segment in segments[emitted:-1]:
+            yield segment
+        emitted = max(emitted, len(segments) - 1)
+    for segment in split_segments(paragraph)[emitted:]:
+        yield segment
+
+async def first_paragraph(chunks: AsyncIterator[str]) -> str:
+    text = ""
+    async for chunk in chunks:
+        text += chunk
+        head, sep, _ = text.lstrip().partition("\n")
+        if sep and head.strip():
+            return head.strip()
+    return text.strip()
+
+
+# === DAG RUNNER ===
+class StageError(Exception):
+    """Raised when a stage without a fallback fails."""
+
+    def __init__(self, stage: str, error: Exception):
+        super().__init__(f"{stage} stage failed: {error}")
+        self.stage = stage
+        self.error = error
+
+
+class Stage:
+    """One step of story creation.
+
+    `run` receives a dict with the results of `deps` once they have all
+    finished. A failing stage resolves to `fallback(error)` when one is given.
+    Background stages are not waited for; they keep running after the
+    pipeline returns.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        run: Callable[[Dict[str, Any]], Awaitable[Any]],
+        deps: Tuple[str, ...] = (),
+        fallback: Optional[Callable[[Exception], Any]] = None,
+        background: bool = False
+    ):
+        self.name = name
+        self.run = run
+        self.deps = deps
+        self.fallback = fallback
+        self.background = background
+
+
+async def run_stages(stages: List[Stage]) -> Tuple[Dict[str, Any], Dict[str, float]]:
+    """Run stages concurrently, each as soon as its dependencies are done.
+
+    Stages must be listed after their dependencies. Returns the results and
+    per-stage wall time in milliseconds. The first failure cancels the rest.
+    """
+    results: Dict[str, Any] = {}
+    timings: Dict[str, float] = {}
+    tasks: Dict[str, asyncio.Task] = {}
+
+    async def _run(stage: Stage) -> Any:
+        if stage.deps:
+            await asyncio.gather(*(tasks[dep] for dep in stage.deps))
+        started = time.perf_counter()
+        try:
+            value = await stage.run({dep: results[dep] for dep in stage.deps})
+        except Exception as e:
+            if stage.fallback is None:
+                raise StageError(stage.name, e) from e
+            print(f"[WARN] {stage.name} stage failed, using fallback: {e}")
+            value = stage.fallback(e)
+        finally:
+            timings[stage.name] = round((time.perf_counter() - started) * 1000, 1)
+        results[stage.name] = value
+        return value
+
+    for stage in stages:
+        tasks[stage.name] = asyncio.create_task(_run(stage))
+
+    foreground = [tasks[stage.name] for stage in stages if not stage.background]
+    try:
+        done, _ = await asyncio.wait(foreground, return_when=asyncio.FIRST_EXCEPTION)
+        for task in done:
+            if task.exception() is not None:
+                raise task.exception()
+    except BaseException:
+        for task in tasks.values():
+            task.cancel()
+        # Collect them so their errors aren't reported as never retrieved
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+        raise
+
+    for stage in stages:
+        if stage.background:
+            _background.add(tasks[stage.name])
+            tasks[stage.name].add_done_callback(_background.discard)
+    return results, timings
+
+
+# === STAGES ===
+async def _content_stage(story: dict, branches: List[_Branch]) -> str:
+    # Streams the story into every branch as it is written
+    parts: List[str] = []
+    try:
+        async for chunk in stream_ai_story(story["genre"], story["theme"], story["length"], story["language"]):
+            parts.append(chunk)
+            for branch in branches:
+                await branch.put(chunk)
+    except BaseException:
+        for branch in branches:
+            branch.close()
+        raise
+    for branch in branches:
+        await branch.put(_END)
+    content = "".join(parts).strip()
+    if not content:
+        raise Exception("OpenRouter API returned an empty story")
+    return content
+
+async def _title_stage(branch: _Branch, language: str) -> str:
+    try:
+        paragraph = await first_paragraph(branch)
+    finally:
+        branch.close()
+    return await generate_story_title(paragraph, language)
+
+async def _tts_stage(branch: _Branch, language: str) -> None:
+    # Warms the segment cache so the story's audio assembles without waiting on TTS
+    lang_code = LANGUAGE_CODES.get(language.lower(), "en")
+    slots = asyncio.Semaphore(PIPELINE_TTS_CONCURRENCY)
+
+    async def _speak(sentence: str) -> None:
+        async with slots:
+            await synthesize_segments([sentence], lang_code)
+
+    # Sentences are taken off the branch right away and wait for a slot in their own
+    # task, so a slow TTS never backs up into the LLM stream feeding the title
+    tasks: List[asyncio.Task] = []
+    try:
+        async for sentence in iter_sentences(branch):
+            tasks.append(asyncio.create_task(_speak(sentence)))
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    finally:
+        branch.close()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    failed = sum(isinstance(r, Exception) for r in results)
+    if failed:
+        print(f"[WARN] {failed} of {len(results)} audio segments failed during generation")
+
+async def story_image(story: dict, base_url: str) -> dict:
+    """Local resized copies of a photo for the story, or genre artwork when there is no photo."""
+    image_url = await find_image_url(title=story.get("title", ""), theme=story["theme"], genre=story["genre"])
+    if image_url:
+        try:
+            return await proxy_image(image_url, base_url)
+        except Exception as e:
+            print(f"[WARN] Image proxy failed for {image_url}: {e}")
+    return await genre_placeholder(story["genre"], base_url)
+
+async def _given(value: Any) -> Any:
+    return value
+
+async def _insert_stage(story_doc: dict) -> dict:
+    await write_buffer.insert_one(story_collection, story_doc)
+    await record_story_created(story_doc["user_id"], story_doc["status"])
+    await bump_version()
+    story_id = str(story_doc["_id"])
+    # Story-level audio reuses any segments the audio stage already produced
+    schedule_prefetch(story_id, story_doc["content"], story_doc["language"], story_doc["status"])
+    return story_doc
+
+
+# === PIPELINE ===
+def story_document(
+    story: dict, story_id: str, title: str, content: str, audio_url: str, image: dict, created_at: str
+) -> dict:
+    """The stored form of a new story; `story` holds the request fields."""
+    return {
+        "_id": ObjectId(story_id),
+        "user_id": story["user_id"],
+        "username": story["username"],
+        "genre": story["genre"],
+        "theme": story["theme"],
+        "length": story["length"],
+        "language": story["language"],
+        "title": title,
+        "content": content,
+        "audio_url": audio_url,
+        "image_url": image["image_url"],
+        "image_variants": image["image_variants"],
+        "image_placeholder": image["image_placeholder"],
+        "source": story["source"],
+        "status": story["status"],
+        "bookmark_count": 0,  # Bookmarks themselves live in the library collection
+        "version": 1,  # $inc'd by every write; feeds the story's ETag
+        "updated_at": datetime.utcnow(),
+        **story_summary_fields(content),
+        "created_at": created_at
+    }
+
+async def create_story(
+    story: dict, story_id: str, audio_url: str, base_url: str, created_at: str = ""
+) -> Tuple[dict, Dict[str, float]]:
+    """Create and store a story from request fields; shared by the AI and manual routes.
+
+    Stages and their dependencies:
+      content, title  AI: streamed from the LLM; the title starts from the first
+                      paragraph while the rest is still being written.
+                      Manual: taken from the request.
+      image           genre and theme only, so it starts immediately; the photo
+                      is stored locally in resized variants.
+      audio           background; AI stories stream finished sentences to TTS,
+                      manual ones synthesize up front. Only when prefetch applies.
+      insert          after content, title and image.
+    Returns the stored document and per-stage timings.
+    """
+    language = story["language"]
+    speak = should_prefetch(story["status"])
+    stages: List[Stage] = []
+
+    if story["source"] == "ai":
+        title_branch = _Branch()
+        tts_branch = _Branch() if speak else None
+        branches = [b for b in (title_branch, tts_branch) if b is not None]
+        stages += [
+            Stage("content", lambda r: _content_stage(story, branches)),
+            Stage("title", lambda r: _title_stage(title_branch, language)),
+        ]
+        if speak:
+            stages.append(Stage(
+                "audio", lambda r: _tts_stage(tts_branch, language),
+                fallback=lambda e: None, background=True
+            ))
+    else:
+        stages += [
+            Stage("content", lambda r: _given(story["content"])),
+            Stage("title", lambda r: _given(story["title"])),
+        ]
+        if speak:
+            stages.append(Stage(
+                "audio", lambda r: synthesize_segments(split_segments(story["content"]), LANGUAGE_CODES.get(language.lower(), "en")),
+                fallback=lambda e: None, background=True
+            ))
+
+    stages.append(Stage(
+        "image", lambda r: story_image(story, base_url),
+        fallback=lambda e: default_artwork(base_url)
+    ))
+
+    def _build_doc(r: Dict[str, Any]) -> dict:
+        return story_document(story, story_id, r["title"], r["content"], audio_url, r["image"], created_at)
+
+    stages.append(Stage("insert", lambda r: _insert_stage(_build_doc(r)), deps=("content", "title", "image")))
+
+    results, timings = await run_stages(stages)
+    return results["insert"], timings
@@ -1,7 +1,7 @@
 import os
-import asyncio
+import json
 from io import BytesIO
-from typing import Optional
+from typing import AsyncIterator, Optional
 from datetime import datetime
 
 from dotenv import load_dotenv
@@ -10,6 +10,12 @@ from gtts import gTTS
 from bson import ObjectId
 
 from db.mongo import story_collection  # Only story_collection now
+from services.tts_pool import tts_pool, TTSQueueFull
+from services import tts_client
+from services.image_cache import lookup_image
+from services.library_service import add_bookmark
+from services.user_stats import record_story_created
+from services.versions import bump_version
 
 # Load environment variables
 load_dotenv()
@@ -23,7 +29,7 @@ if not OPENROUTER_API_KEY:
     raise ValueError("OPENROUTER_API_KEY not set in environment variables")
 
 if not UNSPLASH_ACCESS_KEY:
-    print("Warning: UNSPLASH_ACCESS_KEY not set in environment variables. Using fallback image URLs.")
+    print("Warning: UNSPLASH_ACCESS_KEY not set in environment variables. Stories without an image get genre artwork.")
 
 # Language Code Mapping
 LANGUAGE_CODES = {
@@ -58,6 +64,41 @@ async def generate_ai_story(genre: str, theme: str, length: str, language: str =
         except Exception as e:
             raise Exception(f"OpenRouter API failed: {e}")
 
+# === STREAMING STORY GENERATION ===
+async def stream_ai_story(genre: str, theme: str, length: str, language: str = "english") -> AsyncIterator[str]:
+    """Yield the story text as OpenRouter streams it, one content delta at a time."""
+    prompt = f"Write a {length} {genre} story about {theme} in {language}. Make it engaging and creative."
+    headers = {
+        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
+        "HTTP-Referer": "http://localhost",
+        "Content-Type": "application/json"
+    }
+    data = {
+        "model": OPENROUTER_MODEL,
+        "stream": True,
+        "messages": [
+            {"role": "system", "content": "You are a creative storyteller."},
+            {"role": "user", "content": prompt}
+        ]
+    }
+
+    async with httpx.AsyncClient(timeout=15) as client:
+        try:
+            async with client.stream("POST", "https://openrouter.ai/api/v1/chat/completions", headers=headers, json=data) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    # Server-sent events; lines starting with ":" are keep-alive comments
+                    if not line.startswith("data:"):
+                        continue
+                    payload = line[len("data:"):].strip()
+                    if payload == "[DONE]":
+                        break
+                    delta = json.loads(payload)["choices"][0].get("delta", {}).get("content")
+                    if delta:
+                        yield delta
+        except Exception as e:
+            raise Exception(f"OpenRouter API failed: {e}")
+
 # === TITLE GENERATION ===
 async def generate_story_title(story_text: str, language: str = "english") -> str:
     prompt = f"Summarize the following story into a short title (max 5 words) in {language}:\n\n{story_text}"
@@ -81,46 +122,54 @@ async def generate_story_title(story_text: str, language: str = "english") -> st
         return " ".join(title.split()[:5])  # limit to 5 words
 
 # === TEXT TO SPEECH ===
+# "async" speaks the Google TTS protocol on the event loop; "gtts" runs gTTS on the worker pool
+TTS_ENGINE = os.getenv("TTS_ENGINE", "async").lower()
+
+def _generate_audio(text: str, lang: str) -> bytes:
+    # Module-level so it can be shipped to a process pool worker
+    tts = gTTS(text=text, lang=lang)
+    audio_bytes = BytesIO()
+    tts.write_to_fp(audio_bytes)
+    return audio_bytes.getvalue()
+
+async def synthesize_speech(text: str, lang_code: str) -> bytes:
+    if TTS_ENGINE == "gtts":
+        return await tts_pool.run(_generate_audio, text, lang_code)
+    return await tts_client.synthesize(text, lang_code)
+
 async def text_to_speech(story_text: str, language: str = "english") -> BytesIO:
-    loop = asyncio.get_running_loop()
     lang_code = LANGUAGE_CODES.get(language.lower(), "en")
 
-    def generate_audio(text: str, lang: str) -> BytesIO:
-        tts = gTTS(text=text, lang=lang)
-        audio_bytes = BytesIO()
-        tts.write_to_fp(audio_bytes)
-        audio_bytes.seek(0)
-        return audio_bytes
-
     try:
-        return await loop.run_in_executor(None, generate_audio, story_text, lang_code)
+        audio = await synthesize_speech(story_text, lang_code)
+    except TTSQueueFull:
+        raise
     except Exception:
-        fallback = await loop.run_in_executor(None, generate_audio, "Audio unavailable. Please try again later.", "en")
-        return fallback
+        audio = await synthesize_speech("Audio unavailable. Please try again later.", "en")
+    return BytesIO(audio)
 
 # === IMAGE FETCH ===
-async def fetch_image_url(title: str, theme: str, genre: str) -> str:
+def _image_query(title: str, theme: str, genre: str) -> str:
     query = ", ".join(filter(None, [title.strip(), theme.strip(), genre.strip()]))
-    query = query if query else "story"
+    return query if query else "story"
 
+async def find_image_url(title: str, theme: str, genre: str) -> Optional[str]:
+    """Return a matching Unsplash photo URL, or None when there is none to offer."""
     if not UNSPLASH_ACCESS_KEY:
-        return f"https://source.unsplash.com/800x600/?{query.replace(' ', '+')}"
-
-    url = "https://api.unsplash.com/search/photos"
-    headers = {"Authorization": f"Client-ID {UNSPLASH_ACCESS_KEY}"}
-    params = {"query": query, "per_page": 1, "orientation": "landscape"}
+        return None
+    # Served from the image cache; Unsplash is only called on misses and while quota remains
+    return await lookup_image(_image_query(title, theme, genre), UNSPLASH_ACCESS_KEY)
 
-    try:
-        async with httpx.AsyncClient(timeout=10) as client:
-            response = await client.get(url, headers=headers, params=params)
-            response.raise_for_status()
-            results = response.json().get("results", [])
-            if results:
-                return results[0]["urls"]["regular"]
-    except Exception:
-        pass
+# === SUMMARY FIELDS ===
+TEASER_CHARS = 200
 
-    return f"https://source.unsplash.com/800x600/?{query.replace(' ', '+')}"
+def story_summary_fields(content: str) -> dict:
+    """Card fields stored alongside the content so feeds never need to load it."""
+    text = " ".join(content.split())
+    teaser = text
+    if len(text) > TEASER_CHARS:
+        teaser = text[:TEASER_CHARS].rsplit(" ", 1)[0].rstrip(",;:.") + "…"
+    return {"teaser": teaser, "word_count": len(text.split())}
 
 # === SAVE GENERATED STORY ===
 async def save_story_to_db(user_id: str, username: str, story_data: dict) -> dict:
@@ -130,12 +179,15 @@ async def save_story_to_db(user_id: str, username: str, story_data: dict) -> dic
         "username": username,
         "status": "published",
         "source": "ai",
-        "bookmarked_by": [],
+        "bookmark_count": 0,
+        "version": 1,
         "created_at": datetime.utcnow(),
         "updated_at": datetime.utcnow()
     }
 
     result = await story_collection.insert_one(story_doc)
+    await record_story_created(str(user_id), "published")
+    await bump_version()
     story_doc["id"] = str(result.inserted_id)
     story_doc["user_id"] = str(story_doc["user_id"])
     story_doc["created_at"] = story_doc["created_at"].isoformat() + "Z"
@@ -144,19 +196,5 @@ async def save_story_to_db(user_id: str, username: str, story_data: dict) -> dic
 
 # === SAVE A STORY TO USER'S LIBRARY (Bookmark) ===
 async def save_to_user_library(user_id: str, story_id: str) -> bool:
-    # Check if user already bookmarked
-    story = await story_collection.find_one({
-        "_id": ObjectId(story_id),
-        "bookmarked_by": str(user_id)
-    })
-
-    if story:
-        # Already bookmarked
-        return False
-
-    update_result = await story_collection.update_one(
-        {"_id": ObjectId(story_id)},
-        {"$addToSet": {"bookmarked_by": str(user_id)}}
-    )
-
-    return update_result.modified_count == 1
+    # False if already bookmarked or the story doesn't exist
+    return bool(await add_bookmark(str(user_id), story_id))
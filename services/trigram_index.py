@@ -0,0 +1,187 @@
+from array import array
+from bisect import bisect_left
+from typing import Dict, List, Optional, Set, Tuple
+
+FUZZY_THRESHOLD = 0.5  # share of query trigrams a fuzzy match must contain
+COMPACT_RATIO = 0.25  # rebuild postings once this share of doc numbers is dead
+
+INDEXED_FIELDS = ("title", "theme", "genre", "language")
+
+
+def normalize(text: str) -> str:
+    # Leading space makes word starts searchable (" ki" matches "Kingdom" but not "Viking")
+    return " " + " ".join(text.casefold().split())
+
+def trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TrigramIndex:
+    """In-memory trigram index over story titles and themes.
+
+    Each story gets an increasing doc number; postings are array-backed lists
+    of doc numbers, so they stay sorted by construction. Updates append a new
+    number and leave a tombstone, compacted once tombstones pile up.
+    """
+
+    def __init__(self):
+        self._reset()
+
+    def _reset(self) -> None:
+        self._ids: List[Optional[str]] = []  # doc number -> story id, None once replaced/deleted
+        self._docs: List[dict] = []  # doc number -> indexed fields as given
+        self._fields: List[Tuple[str, str]] = []  # doc number -> normalized (title, theme)
+        self._meta: List[Tuple[str, str]] = []  # doc number -> (genre, language)
+        self._numbers: Dict[str, int] = {}  # story id -> live doc number
+        self._postings: Dict[str, array] = {}
+        self._dead = 0
+
+    def __len__(self) -> int:
+        return len(self._numbers)
+
+    # === MAINTENANCE ===
+    def add(self, story: dict) -> None:
+        story_id = str(story.get("id") or story["_id"])
+        self.remove(story_id)
+        number = len(self._ids)
+        doc = {field: story.get(field, "") for field in INDEXED_FIELDS}
+        title = normalize(doc["title"])
+        theme = normalize(doc["theme"])
+        self._ids.append(story_id)
+        self._docs.append(doc)
+        self._fields.append((title, theme))
+        self._meta.append((doc["genre"], doc["language"].lower()))
+        self._numbers[story_id] = number
+        for gram in trigrams(title) | trigrams(theme):
+            postings = self._postings.get(gram)
+            if postings is None:
+                postings = self._postings[gram] = array("I")
+            postings.append(number)
+
+    def update(self, story: dict) -> bool:
+        """add() unless the story is already indexed with these fields; returns whether it re-indexed."""
+        number = self._numbers.get(str(story.get("id") or story["_id"]))
+        if number is not None and self._docs[number] == {field: story.get(field, "") for field in INDEXED_FIELDS}:
+            return False
+        self.add(story)
+        return True
+
+    def remove(self, story_id: str) -> None:
+        number = self._numbers.pop(story_id, None)
+        if number is None:
+            return
+        self._ids[number] = None
+        self._dead += 1
+        if self._dead > COMPACT_RATIO * len(self._ids):
+            self._compact()
+
+    def _compact(self) -> None:
+        live = [
+            {"id": story_id, **self._docs[number]}
+            for number, story_id in enumerate(self._ids) if story_id is not None
+        ]
+        self._reset()
+        for story in live:
+            self.add(story)
+
+    async def load(self, collection) -> None:
+        """Rebuild from Mongo, oldest first so doc numbers follow _id order."""
+        self._reset()
+        projection = dict.fromkeys(INDEXED_FIELDS, 1)
+        async for story in collection.find({}, projection).sort("_id", 1):
+            self.add(story)
+
+    # === QUERIES ===
+    def _candidates(self, grams: Set[str]) -> array:
+        lists = sorted((self._postings.get(g, array("I")) for g in grams), key=len)
+        if not lists:
+            return array("I", (n for n, i in enumerate(self._ids) if i is not None))
+        result = array("I")
+        rest = lists[1:]
+        for number in lists[0]:
+            if self._ids[number] is None:
+                continue
+            if all(_contains(postings, number) for postings in rest):
+                result.append(number)
+        return result
+
+    def _filtered(self, number: int, genre: Optional[str], language: Optional[str]) -> bool:
+        doc_genre, doc_language = self._meta[number]
+        return (not genre or doc_genre == genre) and (not language or doc_language == language.lower())
+
+    def substring(self, query: str, genre: Optional[str] = None, language: Optional[str] = None) -> List[str]:
+        """Ids of stories whose title or theme contains `query`, title matches first, newest first."""
+        needle = " ".join(query.casefold().split())
+        if not needle:
+            return []
+        grams = trigrams(needle) if len(needle) >= 3 else trigrams(" " + needle) if len(needle) == 2 else set()
+        in_title, in_theme = [], []
+        for number in self._candidates(grams):
+            if not self._filtered(number, genre, language):
+                continue
+            title, theme = self._fields[number]
+            if needle in title:
+                in_title.append(self._ids[number])
+            elif needle in theme:
+                in_theme.append(self._ids[number])
+        # Doc numbers change whenever a story is re-added, so recency comes from the id itself
+        in_title.sort(key=_recency, reverse=True)
+        in_theme.sort(key=_recency, reverse=True)
+        return in_title + in_theme
+
+    def fuzzy(self, query: str, genre: Optional[str] = None, language: Optional[str] = None) -> List[str]:
+        """Ids of stories sharing most of the query's trigrams, best match first; tolerates typos."""
+        grams = trigrams(normalize(query))
+        if not grams:
+            return []
+        counts: Dict[int, int] = {}
+        for gram in grams:
+            for number in self._postings.get(gram, ()):
+                counts[number] = counts.get(number, 0) + 1
+        needed = FUZZY_THRESHOLD * len(grams)
+        scored = [
+            (count, _recency(self._ids[number]), self._ids[number]) for number, count in counts.items()
+            if count >= needed and self._ids[number] is not None and self._filtered(number, genre, language)
+        ]
+        scored.sort(reverse=True)  # Ties go to newer stories
+        return [story_id for _, _, story_id in scored]
+
+    def autocomplete(self, prefix: str, limit: int = 10) -> List[dict]:
+        """Title suggestions for search-as-you-type, ranked by how early the prefix matches."""
+        needle = " ".join(prefix.casefold().split())
+        if not needle:
+            return []
+        grams = trigrams(" " + needle)
+        ranked = []
+        for number in self._candidates(grams):
+            title, theme = self._fields[number]
+            if title.startswith(" " + needle):
+                rank = 0  # whole title starts with it
+            elif " " + needle in title:
+                rank = 1  # a title word starts with it
+            elif " " + needle in theme:
+                rank = 2
+            else:
+                continue
+            # Shorter titles first, then newer stories
+            ranked.append((rank, len(title), -_recency(self._ids[number]), number))
+        ranked.sort()
+        return [
+            {"id": self._ids[number], "title": self._docs[number]["title"], "theme": self._docs[number]["theme"]}
+            for _, _, _, number in ranked[:limit]
+        ]
+
+
+def _recency(story_id: str) -> int:
+    # Story ids are ObjectIds, whose leading bytes are the creation time
+    try:
+        return int(story_id, 16)
+    except ValueError:
+        return 0
+
+def _contains(postings: array, number: int) -> bool:
+    i = bisect_left(postings, number)
+    return i < len(postings) and postings[i] == number
+
+
+story_index = TrigramIndex()
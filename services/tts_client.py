@@ -0,0 +1,172 @@
+import os
+import re
+import json
+import base64
+import asyncio
+import urllib.parse
+from string import whitespace
+from typing import List, Optional
+
+import httpx
+
+# Google Translate TTS endpoint (override to point at a local stand-in)
+GOOGLE_TTS_URL = os.getenv(
+    "GOOGLE_TTS_URL", "https://translate.google.com/_/TranslateWebserverUi/data/batchexecute"
+)
+GOOGLE_TTS_MAX_CHARS = 100
+GOOGLE_TTS_RPC = "jQ1olc"
+GOOGLE_TTS_HEADERS = {
+    "Referer": "http://translate.google.com/",
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; WOW64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/47.0.2526.106 Safari/537.36"
+    ),
+    "Content-Type": "application/x-www-form-urlencoded;charset=utf-8",
+}
+
+# Connection pool shared by every synthesis on this process
+TTS_HTTP_MAX_CONNECTIONS = int(os.getenv("TTS_HTTP_MAX_CONNECTIONS", "100"))
+TTS_HTTP_CONCURRENCY = int(os.getenv("TTS_HTTP_CONCURRENCY", "64"))
+TTS_HTTP_TIMEOUT = float(os.getenv("TTS_HTTP_TIMEOUT", "15"))
+
+
+class TTSError(Exception):
+    """Raised when the TTS endpoint returns no usable audio."""
+
+
+# === TOKENIZATION (same rules as gTTS' default pre-processors and tokenizer) ===
+ABBREVIATIONS = ["dr", "jr", "mr", "mrs", "ms", "msgr", "prof", "sr", "st"]
+SUB_PAIRS = [("Esq.", "Esquire")]
+ALL_PUNC = "?!？！.,¡()[]¿…‥،;:—。，、：\n"
+TONE_MARKS = "?!？！"
+PERIOD_COMMA = ".,"
+COLON = ":"
+
+
+def _alternation(args, pattern_func) -> str:
+    return "|".join(pattern_func(re.escape(arg)) for arg in args)
+
+_OTHER_PUNC = "".join(set(ALL_PUNC) - set(TONE_MARKS) - set(PERIOD_COMMA) - set(COLON))
+
+_PRE_PROCESSORS = [
+    # tone_marks: add a space after tone-modifying punctuation
+    (re.compile(_alternation(TONE_MARKS, lambda x: f"(?<={x})")), " "),
+    # end_of_line: re-join words hyphenated across a line break
+    (re.compile(_alternation("-", lambda x: f"{x}\n")), ""),
+    # abbreviations: drop the period after common abbreviations
+    (re.compile(_alternation(ABBREVIATIONS, lambda x: rf"(?<={x})(?=\.)."), re.IGNORECASE), ""),
+]
+_WORD_SUBS = [(re.compile(re.escape(src), re.IGNORECASE), dst) for src, dst in SUB_PAIRS]
+
+_TOKENIZER = re.compile("|".join([
+    _alternation(TONE_MARKS, lambda x: f"(?<={x})."),
+    _alternation(PERIOD_COMMA, lambda x: rf"(?<!\.[a-z]){x} "),
+    _alternation(COLON, lambda x: rf"(?<!\d){x}"),
+    _alternation(_OTHER_PUNC, lambda x: f"{x}"),
+]), re.IGNORECASE)
+
+
+def _clean_tokens(tokens: List[str]) -> List[str]:
+    # Strip tokens and drop those made only of punctuation/whitespace
+    junk = set(ALL_PUNC + whitespace)
+    return [t.strip() for t in tokens if not set(t) <= junk]
+
+
+def _minimize(the_string: str, delim: str, max_size: int) -> List[str]:
+    if the_string.startswith(delim):
+        the_string = the_string[len(delim):]
+
+    if len(the_string) > max_size:
+        try:
+            idx = the_string.rindex(delim, 0, max_size)
+        except ValueError:
+            idx = max_size
+        return [the_string[:idx]] + _minimize(the_string[idx:], delim, max_size)
+    return [the_string]
+
+
+def tokenize(text: str) -> List[str]:
+    text = text.strip()
+    for regex, repl in _PRE_PROCESSORS:
+        text = regex.sub(repl, text)
+    for regex, repl in _WORD_SUBS:
+        text = regex.sub(repl, text)
+
+    if len(text) <= GOOGLE_TTS_MAX_CHARS:
+        return _clean_tokens([text])
+
+    tokens = _clean_tokens(_TOKENIZER.split(text))
+    min_tokens: List[str] = []
+    for t in tokens:
+        min_tokens += _minimize(t, " ", GOOGLE_TTS_MAX_CHARS)
+    return [t for t in min_tokens if t]
+
+
+# === PROTOCOL ===
+def _package_rpc(text: str, lang: str, slow: bool = False) -> str:
+    parameter = [text, lang, True if slow else None, "null"]  # gTTS Speed.SLOW / Speed.NORMAL
+    escaped_parameter = json.dumps(parameter, separators=(",", ":"))
+    rpc = [[[GOOGLE_TTS_RPC, escaped_parameter, None, "generic"]]]
+    escaped_rpc = json.dumps(rpc, separators=(",", ":"))
+    return f"f.req={urllib.parse.quote(escaped_rpc)}&"
+
+_AUDIO_RE = re.compile(r'jQ1olc","\[\\"(.*)\\"]')
+
+
+def _extract_audio(body: str) -> bytes:
+    # A response may carry the audio over several RPC lines; gTTS writes them all, in order
+    chunks = []
+    for line in body.splitlines():
+        if GOOGLE_TTS_RPC in line:
+            match = _AUDIO_RE.search(line)
+            if not match:
+                raise TTSError("TTS endpoint returned no audio for this segment")
+            chunks.append(base64.b64decode(match.group(1).encode("ascii")))
+    if not chunks:
+        raise TTSError("Unexpected TTS response")
+    return b"".join(chunks)
+
+
+# === CLIENT ===
+_client: Optional[httpx.AsyncClient] = None
+_request_slots: Optional[asyncio.Semaphore] = None
+
+
+def _get_client() -> httpx.AsyncClient:
+    global _client, _request_slots
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=TTS_HTTP_TIMEOUT,
+            headers=GOOGLE_TTS_HEADERS,
+            limits=httpx.Limits(
+                max_connections=TTS_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=TTS_HTTP_MAX_CONNECTIONS,
+            ),
+        )
+        _request_slots = asyncio.Semaphore(TTS_HTTP_CONCURRENCY)
+    return _client
+
+
+async def _synthesize_part(part: str, lang: str, slow: bool) -> bytes:
+    client = _get_client()
+    async with _request_slots:
+        response = await client.post(GOOGLE_TTS_URL, content=_package_rpc(part, lang, slow))
+    response.raise_for_status()
+    return _extract_audio(response.text)
+
+
+async def synthesize(text: str, lang: str = "en", slow: bool = False) -> bytes:
+    """Return MP3 bytes for `text`, byte-for-byte what gTTS.write_to_fp would produce."""
+    parts = tokenize(text)
+    if not parts:
+        raise ValueError("No text to speak")
+    # Parts are fetched concurrently and concatenated in order, like gTTS' sequential writes
+    chunks = await asyncio.gather(*(_synthesize_part(part, lang, slow) for part in parts))
+    return b"".join(chunks)
+
+
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
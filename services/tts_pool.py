@@ -0,0 +1,113 @@
+import os
+import time
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+# Pool configuration
+TTS_POOL_MODE = os.getenv("TTS_POOL_MODE", "thread").lower()  # "thread" or "process"
+TTS_WORKERS = int(os.getenv("TTS_WORKERS", "8"))
+TTS_QUEUE_SIZE = int(os.getenv("TTS_QUEUE_SIZE", "32"))
+
+
+class TTSQueueFull(Exception):
+    """Raised when the TTS pool already has a full backlog of waiting jobs."""
+
+
+class TTSWorkerPool:
+    """Dedicated executor for blocking TTS engines.
+
+    At most `workers` jobs run at once; up to `queue_size` more may wait for a
+    free worker. Anything beyond that is rejected with TTSQueueFull so callers
+    can degrade (e.g. defer audio) instead of piling up behind a slow upstream.
+    """
+
+    def __init__(self, workers: int = TTS_WORKERS, queue_size: int = TTS_QUEUE_SIZE, mode: str = TTS_POOL_MODE):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Unknown TTS pool mode: {mode}")
+        self.workers = max(1, workers)
+        self.queue_size = max(0, queue_size)
+        self.mode = mode
+        self._executor: Optional[Executor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+        self.in_flight = 0
+        self.queued = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._wait_last = 0.0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.mode == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="tts")
+        return self._executor
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        # In process mode `func` and its arguments must be picklable (module-level function).
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+
+        if self._slots.locked() and self.queued >= self.queue_size:
+            self.rejected += 1
+            raise TTSQueueFull(f"TTS queue is full ({self.queued} waiting, {self.in_flight} running)")
+
+        self.submitted += 1
+        self.queued += 1
+        enqueued_at = time.perf_counter()
+        try:
+            await self._slots.acquire()
+        finally:
+            self.queued -= 1
+
+        wait = time.perf_counter() - enqueued_at
+        self._wait_total += wait
+        self._wait_last = wait
+        self._wait_max = max(self._wait_max, wait)
+
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._get_executor(), func, *args)
+        except Exception:
+            self.failed += 1
+            raise
+        else:
+            self.completed += 1
+            return result
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+
+    def stats(self) -> dict:
+        started = self.completed + self.failed + self.in_flight
+        return {
+            "mode": self.mode,
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "queue_wait_ms": {
+                "avg": round(self._wait_total / started * 1000, 2) if started else 0.0,
+                "max": round(self._wait_max * 1000, 2),
+                "last": round(self._wait_last * 1000, 2),
+            },
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+tts_pool = TTSWorkerPool()
@@ -0,0 +1,109 @@
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from db.mongo import library_collection, story_collection, user_stats_collection
+from services.write_buffer import write_buffer
+
+# Counter fields of a user_stats document (_id is the user id)
+STAT_FIELDS = ("stories", "drafts", "published", "bookmarks")
+# Story status -> counter it contributes to
+_STATUS_FIELDS = {"draft": "drafts", "published": "published"}
+
+BATCH_SIZE = 500
+
+
+async def _inc(user_id: str, counters: Dict[str, int]) -> None:
+    counters = {field: delta for field, delta in counters.items() if delta}
+    if counters:
+        await write_buffer.update_one(user_stats_collection, {"_id": str(user_id)}, {"$inc": counters}, upsert=True)
+
+# === WRITE HOOKS ===
+async def record_story_created(user_id: str, status: str) -> None:
+    await _inc(user_id, {"stories": 1, _STATUS_FIELDS[status]: 1})
+
+async def record_stories_created(counts: Dict[Tuple[str, str], int]) -> None:
+    """Bulk form of record_story_created: {(user_id, status): number of new stories}."""
+    per_user: Dict[str, Dict[str, int]] = {}
+    for (user_id, status), count in counts.items():
+        counters = per_user.setdefault(str(user_id), {"stories": 0})
+        counters["stories"] += count
+        field = _STATUS_FIELDS[status]
+        counters[field] = counters.get(field, 0) + count
+    requests = [
+        UpdateOne({"_id": user_id}, {"$inc": counters}, upsert=True)
+        for user_id, counters in per_user.items()
+    ]
+    if requests:
+        await user_stats_collection.bulk_write(requests, ordered=False)
+
+async def record_story_deleted(user_id: str, status: str) -> None:
+    await _inc(user_id, {"stories": -1, _STATUS_FIELDS[status]: -1})
+
+async def record_status_change(user_id: str, old_status: Optional[str], new_status: str) -> None:
+    if old_status == new_status:
+        return
+    counters = {_STATUS_FIELDS[new_status]: 1}
+    if old_status in _STATUS_FIELDS:
+        counters[_STATUS_FIELDS[old_status]] = -1
+    await _inc(user_id, counters)
+
+async def record_bookmark(user_id: str, delta: int) -> None:
+    await _inc(user_id, {"bookmarks": delta})
+
+async def record_bookmarks_removed(user_ids: List[str]) -> None:
+    """One bookmark fewer for each user, e.g. when a bookmarked story is deleted."""
+    for start in range(0, len(user_ids), BATCH_SIZE):
+        batch = [
+            UpdateOne({"_id": str(user_id)}, {"$inc": {"bookmarks": -1}}, upsert=True)
+            for user_id in user_ids[start:start + BATCH_SIZE]
+        ]
+        await user_stats_collection.bulk_write(batch, ordered=False)
+
+# === READS ===
+async def get_user_stats(user_id: str) -> Dict[str, int]:
+    """All of a user's counters in one point read; users without activity get zeros."""
+    doc = await user_stats_collection.find_one({"_id": str(user_id)}) or {}
+    return {field: max(doc.get(field, 0), 0) for field in STAT_FIELDS}
+
+# === RECONCILIATION ===
+async def reconcile_user_stats() -> int:
+    """Recount every user's counters from stories and library and fix any drift.
+
+    Increments racing with the recount can still be lost; running it again
+    (or when traffic is quiet) settles them.
+    """
+    totals: Dict[str, Dict[str, int]] = {}
+
+    def _counters(user_id) -> Dict[str, int]:
+        return totals.setdefault(str(user_id), dict.fromkeys(STAT_FIELDS, 0))
+
+    by_status = story_collection.aggregate([
+        {"$group": {"_id": {"user_id": "$user_id", "status": "$status"}, "count": {"$sum": 1}}}
+    ])
+    async for group in by_status:
+        counters = _counters(group["_id"].get("user_id", "guest"))
+        counters["stories"] += group["count"]
+        field = _STATUS_FIELDS.get(group["_id"].get("status"))
+        if field:
+            counters[field] += group["count"]
+
+    async for group in library_collection.aggregate([{"$group": {"_id": "$user_id", "count": {"$sum": 1}}}]):
+        _counters(group["_id"])["bookmarks"] = group["count"]
+
+    # Users whose last story or bookmark is gone drop back to zero
+    async for doc in user_stats_collection.find({}, {"_id": 1}):
+        _counters(doc["_id"])
+
+    fixed = 0
+    batch = []
+    for user_id, counters in totals.items():
+        batch.append(UpdateOne({"_id": user_id}, {"$set": counters}, upsert=True))
+        if len(batch) >= BATCH_SIZE:
+            result = await user_stats_collection.bulk_write(batch, ordered=False)
+            fixed += result.modified_count + result.upserted_count
+            batch = []
+    if batch:
+        result = await user_stats_collection.bulk_write(batch, ordered=False)
+        fixed += result.modified_count + result.upserted_count
+    return fixed
@@ -0,0 +1,15 @@
+from db.mongo import collection_version_collection
+from services.write_buffer import write_buffer
+
+# Every story carries a `version` that write routes $inc; this counter moves on
+# any change that can alter a story listing (stories or library entries)
+STORIES = "stories"
+
+
+async def bump_version(name: str = STORIES) -> None:
+    """Call after the write has landed, so a new version never labels old data."""
+    await write_buffer.update_one(collection_version_collection, {"_id": name}, {"$inc": {"version": 1}}, upsert=True)
+
+async def current_version(name: str = STORIES) -> int:
+    doc = await collection_version_collection.find_one({"_id": name})
+    return doc["version"] if doc else 0
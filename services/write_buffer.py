@@ -0,0 +1,166 @@
+import os
+import sys
+import time
+import asyncio
+from typing import Dict, List, Set, Tuple
+
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, WriteError
+from pymongo.write_concern import WriteConcern
+
+# Group hot-path writes into one bulk_write per collection: "off" writes each one directly
+WRITE_BUFFER = os.getenv("WRITE_BUFFER", "off").lower() == "on"
+# Flush once this many writes are waiting for a collection...
+WRITE_BUFFER_MAX_OPS = int(os.getenv("WRITE_BUFFER_MAX_OPS", "100"))
+# ...or this long after the first of them arrived
+WRITE_BUFFER_MAX_DELAY_MS = float(os.getenv("WRITE_BUFFER_MAX_DELAY_MS", "5"))
+# When a buffered write counts as done: "acknowledged" (w=1), "journaled" (w=1, j) or "majority" (w=majority, j)
+WRITE_BUFFER_DURABILITY = os.getenv("WRITE_BUFFER_DURABILITY", "acknowledged").lower()
+
+_WRITE_CONCERNS = {
+    "acknowledged": WriteConcern(w=1),
+    "journaled": WriteConcern(w=1, j=True),
+    "majority": WriteConcern(w="majority", j=True),
+}
+
+_Pending = Tuple[object, asyncio.Future]
+
+
+class WriteBuffer:
+    """Coalesces small writes from concurrent requests into bulk_write calls.
+
+    Every caller still awaits its own write: the future resolves once its
+    batch is acknowledged at the configured durability, or raises that
+    write's own error (DuplicateKeyError and friends), so call sites keep
+    their semantics. Batches are unordered, so only buffer writes that
+    don't depend on each other's order ($inc, inserts of new documents).
+    """
+
+    def __init__(
+        self,
+        enabled: bool = WRITE_BUFFER,
+        max_ops: int = WRITE_BUFFER_MAX_OPS,
+        max_delay_ms: float = WRITE_BUFFER_MAX_DELAY_MS,
+        durability: str = WRITE_BUFFER_DURABILITY
+    ):
+        self.enabled = enabled
+        self.max_ops = max_ops
+        self.max_delay = max_delay_ms / 1000
+        self.write_concern = _WRITE_CONCERNS.get(durability, _WRITE_CONCERNS["acknowledged"])
+        self._pending: Dict[str, List[_Pending]] = {}
+        self._collections: Dict[str, object] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._flushing: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.writes = 0
+
+    # === CALL SITES ===
+    async def insert_one(self, collection, document: dict) -> None:
+        if not self.enabled:
+            await collection.insert_one(document)
+            return
+        await self._submit(collection, InsertOne(document))
+
+    async def update_one(self, collection, filter: dict, update: dict, upsert: bool = False) -> None:
+        if not self.enabled:
+            await collection.update_one(filter, update, upsert=upsert)
+            return
+        await self._submit(collection, UpdateOne(filter, update, upsert=upsert))
+
+    # === BATCHING ===
+    async def _submit(self, collection, request) -> None:
+        name = collection.full_name
+        future = asyncio.get_running_loop().create_future()
+        pending = self._pending.setdefault(name, [])
+        self._collections[name] = collection
+        pending.append((request, future))
+        if len(pending) >= self.max_ops:
+            self._start_flush(name)
+        elif len(pending) == 1:
+            self._timers[name] = asyncio.get_running_loop().call_later(self.max_delay, self._start_flush, name)
+        await future
+
+    def _start_flush(self, name: str) -> None:
+        task = asyncio.create_task(self._flush(name))
+        self._flushing.add(task)
+        task.add_done_callback(self._flushing.discard)
+
+    async def _flush(self, name: str) -> None:
+        timer = self._timers.pop(name, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(name, [])
+        if not batch:
+            return
+        collection = self._collections[name].with_options(write_concern=self.write_concern)
+        errors = {}
+        try:
+            await collection.bulk_write([request for request, _ in batch], ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                kind = DuplicateKeyError if error["code"] == 11000 else WriteError
+                errors[error["index"]] = kind(error.get("errmsg", ""), error["code"], error)
+            if e.details.get("writeConcernErrors"):
+                # Written, but not as durably as asked; nobody can tell which, so all fail
+                errors = {i: e for i in range(len(batch))}
+        except Exception as e:
+            errors = {i: e for i in range(len(batch))}
+        self.batches += 1
+        self.writes += len(batch)
+        for i, (_, future) in enumerate(batch):
+            if future.done():
+                continue  # The caller went away; the write itself still happened
+            if i in errors:
+                future.set_exception(errors[i])
+            else:
+                future.set_result(None)
+
+    async def flush(self) -> None:
+        """Write out everything waiting, e.g. on shutdown."""
+        for name in list(self._pending):
+            await self._flush(name)
+        if self._flushing:
+            await asyncio.gather(*self._flushing, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "batches": self.batches,
+            "writes": self.writes,
+            "avg_batch": round(self.writes / self.batches, 2) if self.batches else 0,
+            "waiting": sum(len(p) for p in self._pending.values()),
+        }
+
+
+write_buffer = WriteBuffer()
+
+
+# === BENCHMARK ===
+async def _bench(count: int, concurrency: int) -> None:
+    from db.mongo import db
+
+    collection = db["write_buffer_bench"]
+    await collection.drop()
+    slots = asyncio.Semaphore(concurrency)
+
+    async def run(label: str, buffer: WriteBuffer) -> None:
+        async def one(i: int) -> None:
+            async with slots:
+                await buffer.insert_one(collection, {"i": i, "label": label})
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(count)))
+        await buffer.flush()
+        elapsed = time.perf_counter() - start
+        print(f"{label}: {count / elapsed:,.0f} writes/s ({elapsed:.2f} s)")
+
+    try:
+        await run("direct insert_one", WriteBuffer(enabled=False))
+        for durability in _WRITE_CONCERNS:
+            await run(f"buffered, {durability}", WriteBuffer(enabled=True, durability=durability))
+    finally:
+        await collection.drop()
+
+if __name__ == "__main__":
+    # python -m services.write_buffer [writes] [concurrent callers]
+    args = [int(a) for a in sys.argv[1:3]]
+    asyncio.run(_bench(*(args + [5000, 200][len(args):])))
@@ -0,0 +1,5 @@
+import os
+
+# Required at import time; the Mongo client connects lazily and nothing here calls OpenRouter
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+os.environ.setdefault("OPENROUTER_API_KEY", "test")
@@ -0,0 +1,46 @@
+import time
+import asyncio
+
+import pytest
+
+pytest.importorskip("motor")
+
+from services import audio_segments
+from services.tts_pool import TTSWorkerPool
+
+
+class _NoSegments:
+    """An audio_segments collection with nothing stored yet."""
+
+    def find(self, *args, **kwargs):
+        return self
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        raise StopAsyncIteration
+
+    async def update_one(self, *args, **kwargs):
+        pass
+
+
+def test_long_story_fits_through_the_tts_pool(monkeypatch):
+    # Default pool shape with TTS_ENGINE=gtts: 8 workers, 32 queued
+    pool = TTSWorkerPool(workers=8, queue_size=32, mode="thread")
+
+    def _speak(text: str) -> bytes:
+        time.sleep(0.005)
+        return text.encode("utf-8")
+
+    async def _synthesize(text: str, lang_code: str) -> bytes:
+        return await pool.run(_speak, text)
+
+    monkeypatch.setattr(audio_segments, "audio_segment_collection", _NoSegments())
+    monkeypatch.setattr(audio_segments, "synthesize_speech", _synthesize)
+    sentences = [f"Sentence number {i} of a long story." for i in range(60)]
+
+    audio = asyncio.run(audio_segments.synthesize_segments(sentences, "en"))
+
+    assert audio == [s.encode("utf-8") for s in sentences]
+    assert pool.rejected == 0
@@ -0,0 +1,155 @@
+import os
+import asyncio
+
+import pytest
+
+pytest.importorskip("motor")
+
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+
+from services import audio_service, change_feed as change_feed_module
+from services.audio_segments import content_hash
+from services.change_feed import ChangeFeed
+from services.trigram_index import story_index
+
+
+def _story(story_id: str, title: str = "The Lost Kingdom") -> dict:
+    return {"_id": story_id, "title": title, "theme": "a sunken city", "genre": "Fantasy", "language": "english"}
+
+def _hold_audio(story_id: str, content: str) -> None:
+    audio_service.audio_cache[story_id] = b"mp3"
+    audio_service._versions[story_id] = content_hash(content, "english")
+
+def _update(story_id: str, fields: dict, title: str = "The Lost Kingdom") -> dict:
+    return {
+        "operationType": "update",
+        "documentKey": {"_id": ObjectId(story_id)},
+        "fullDocument": {k: v for k, v in _story(story_id, title).items() if k != "_id"},
+        "changedFields": list(fields),
+        "updateDescription": {"updatedFields": {k: v for k, v in fields.items() if k == "content"}},
+    }
+
+async def _until(condition, timeout: float = 10) -> None:
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.05)
+
+
+# === EVENT HANDLING ===
+@pytest.fixture
+def story_id():
+    story_id = str(ObjectId())
+    story_index.add(_story(story_id))
+    _hold_audio(story_id, "Once upon a time")
+    yield story_id
+    story_index.remove(story_id)
+    audio_service.forget_story_audio(story_id)
+
+def test_bookmark_keeps_audio_and_index_entry(story_id):
+    number = story_index._numbers[story_id]
+    ChangeFeed().apply_change(_update(story_id, {"bookmark_count": 3, "version": 4, "updated_at": None}))
+    assert story_id in audio_service.audio_cache
+    assert story_index._numbers[story_id] == number
+
+def test_own_echo_keeps_current_audio(story_id):
+    ChangeFeed().apply_change(_update(story_id, {"content": "Once upon a time", "version": 2}))
+    assert story_id in audio_service.audio_cache
+
+def test_content_edit_drops_audio_but_not_index_entry(story_id):
+    number = story_index._numbers[story_id]
+    ChangeFeed().apply_change(_update(story_id, {"content": "A different story", "version": 2}))
+    assert story_id not in audio_service.audio_cache
+    assert story_index._numbers[story_id] == number
+
+def test_title_edit_reindexes(story_id):
+    ChangeFeed().apply_change(_update(story_id, {"title": "Dragon Harbour"}, title="Dragon Harbour"))
+    assert story_index.substring("dragon harbour") == [story_id]
+    assert story_id in audio_service.audio_cache
+
+def test_delete_drops_everything(story_id):
+    ChangeFeed().apply_change({"operationType": "delete", "documentKey": {"_id": ObjectId(story_id)}})
+    assert story_id not in audio_service.audio_cache
+    assert story_index.substring("lost kingdom") == []
+
+
+# === POLLING FALLBACK ===
+class _Cursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def __aiter__(self):
+        for doc in self.docs:
+            yield dict(doc)
+
+class _Standalone:
+    """A stories collection on a server without change streams."""
+
+    def __init__(self, docs):
+        self.docs = docs
+
+    def watch(self, *args, **kwargs):
+        raise OperationFailure("The $changeStream stage is only supported on replica sets", code=40573)
+
+    def find(self, query, projection=None):
+        ids = query.get("_id", {}).get("$in")
+        return _Cursor([doc for doc in self.docs if ids is None or doc["_id"] in ids])
+
+def test_falls_back_to_polling_without_a_replica_set(monkeypatch):
+    oid = ObjectId()
+    monkeypatch.setattr(change_feed_module, "story_collection", _Standalone([{**_story(oid, "Polled Tale"), "content": "x"}]))
+    monkeypatch.setattr(change_feed_module, "deleted_story_collection", _Standalone([]))
+    monkeypatch.setattr(change_feed_module, "CHANGE_FEED_POLL_SECONDS", 0.01)
+
+    async def scenario():
+        feed = ChangeFeed("auto")
+        feed.start()
+        try:
+            await _until(lambda: feed.applied > 0)
+            assert feed.active_mode == "poll"
+            assert story_index.substring("polled tale") == [str(oid)]
+        finally:
+            await feed.stop()
+            story_index.remove(str(oid))
+
+    asyncio.run(scenario())
+
+
+# === REPLICA SET ===
+@pytest.mark.skipif(
+    not os.getenv("CHANGE_FEED_TEST_REPLICA_SET"),
+    reason="set CHANGE_FEED_TEST_REPLICA_SET=1 with MONGO_URI pointing at a replica set"
+)
+def test_change_stream_on_a_replica_set():
+    from db.mongo import story_collection
+
+    async def scenario():
+        feed = ChangeFeed("stream")
+        feed.start()
+        oid = ObjectId()
+        story_id = str(oid)
+        try:
+            await _until(lambda: feed.active_mode == "stream")
+            await story_collection.insert_one({**_story(oid, "Stream Test Tale"), "content": "Once upon a time"})
+            await _until(lambda: story_index.substring("stream test tale") == [story_id])
+
+            _hold_audio(story_id, "Once upon a time")
+            applied = feed.applied
+            await story_collection.update_one({"_id": oid}, {"$inc": {"bookmark_count": 1, "version": 1}})
+            await _until(lambda: feed.applied > applied)
+            assert story_id in audio_service.audio_cache
+
+            await story_collection.update_one({"_id": oid}, {"$set": {"content": "Something new", "title": "Renamed Tale"}})
+            await _until(lambda: story_index.substring("renamed tale") == [story_id])
+            assert story_id not in audio_service.audio_cache
+
+            await story_collection.delete_one({"_id": oid})
+            await _until(lambda: story_index.substring("renamed tale") == [])
+        finally:
+            await story_collection.delete_one({"_id": oid})
+            audio_service.forget_story_audio(story_id)
+            story_index.remove(story_id)
+            await feed.stop()
+
+    asyncio.run(scenario())
@@ -0,0 +1,23 @@
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from api.pagination import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    last_id = ObjectId()
+    cursor = decode_cursor(encode_cursor(last_id, 42))
+    assert cursor == {"id": last_id, "k": 42}
+
+
+@pytest.mark.parametrize("cursor", [
+    "eyJpZCI6Inp6In0",  # {"id":"zz"}: not an ObjectId
+    "eyJrIjoxfQ",       # {"k":1}: no id
+    "WzFd",             # [1]: not an object
+    "%%%",
+])
+def test_malformed_cursor_is_a_client_error(cursor):
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor(cursor)
+    assert exc.value.status_code == 400
@@ -0,0 +1,123 @@
+import pytest
+
+gtts = pytest.importorskip("gtts")
+
+from services.tts_client import _package_rpc, tokenize
+
+SAMPLES = [
+    "Hello world",
+    "The U.S. Army marched on. Dr. Smith said: it is 10:30, wait! Really? Yes.",
+    "E.G. FOO BAR, I.E. BAZ. " * 8,
+    "Mr. and Mrs. Jones went to St. Ives, Esq. Brown followed… then (quietly) left; "
+    "the end—or was it? ¡Sí! ¿Qué? " * 4,
+    "A hyphen-\nated word across lines, then a very long sentence without any punctuation at all "
+    "that keeps on going well past the one hundred character limit of the endpoint so it must be split",
+    "第一句。第二句，第三句：结束！" * 10,
+]
+
+
+def _gtts(text: str, slow: bool = False):
+    return gtts.gTTS(text, lang="en", slow=slow, lang_check=False)
+
+
+@pytest.mark.parametrize("text", SAMPLES)
+def test_tokenize_matches_gtts(text):
+    assert tokenize(text) == _gtts(text)._tokenize(text)
+
+
+@pytest.mark.parametrize("slow", [False, True])
+@pytest.mark.parametrize("text", SAMPLES)
+def test_rpc_matches_gtts(text, slow):
+    reference = _gtts(text, slow)
+    assert [_package_rpc(part, "en", slow) for part in tokenize(text)] == [
+        reference._package_rpc(part) for part in reference._tokenize(text)
+    ]
+
+
+# === OUTPUT PARITY AGAINST A LOCAL STAND-IN ===
+import io
+import json
+import base64
+import asyncio
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from services import tts_client
+
+# A batchexecute response as recorded from translate.google.com, with the audio swapped for
+# bytes derived from the request so every part is distinguishable
+RECORDED_RESPONSE = (
+    ")]}}'\n\n{size}\n"
+    '[["wrb.fr","jQ1olc","[\\"{audio}\\"]",null,null,null,"generic"]]\n'
+    '58\n[["di",104],["af.httprm",103,"-3469581094836420466",23]]\n'
+    "25\n[[\"e\",4,null,null,{size}]]\n"
+)
+
+
+def _recorded(text: str) -> str:
+    parts = [f"audio for {text!r}".encode("utf-8")]
+    if "twice" in text:
+        parts.append(b" and its second chunk")  # Long parts come back over several RPC lines
+    return "".join(
+        RECORDED_RESPONSE.format(size=len(part) + 64, audio=base64.b64encode(part).decode("ascii"))
+        for part in parts
+    )
+
+
+class _StandIn(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, as the pooled client expects
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"])).decode("utf-8")
+        rpc = json.loads(urllib.parse.parse_qs(body)["f.req"][0])
+        text = json.loads(rpc[0][0][1])[0]
+        payload = _recorded(text).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stand_in(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StandIn, bind_and_activate=False)
+    server.request_queue_size = 128  # synthesize() sends every part at once
+    server.server_bind()
+    server.server_activate()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/_/TranslateWebserverUi/data/batchexecute"
+    monkeypatch.setenv("NO_PROXY", "127.0.0.1")
+    monkeypatch.setattr(tts_client, "GOOGLE_TTS_URL", url)
+    monkeypatch.setattr(gtts.tts, "_translate_url", lambda tld, path: url)
+    yield url
+    server.shutdown()
+
+
+@pytest.mark.parametrize("slow", [False, True])
+@pytest.mark.parametrize("text", SAMPLES + ["Say it twice. " * 12])
+def test_synthesize_matches_gtts_output(stand_in, text, slow):
+    reference = io.BytesIO()
+    _gtts(text, slow).write_to_fp(reference)
+
+    async def synthesize():
+        try:
+            return await tts_client.synthesize(text, "en", slow)
+        finally:
+            await tts_client.close_client()
+
+    assert asyncio.run(synthesize()) == reference.getvalue()
+
+
+def test_extract_audio_joins_every_chunk():
+    assert tts_client._extract_audio(_recorded("twice")) == b"audio for 'twice' and its second chunk"
+
+def test_extract_audio_rejects_a_response_without_audio():
+    with pytest.raises(tts_client.TTSError):
+        tts_client._extract_audio(")]}'\n\n25\n[[\"e\",4,null,null,160]]\n")
+    with pytest.raises(tts_client.TTSError):
+        tts_client._extract_audio('[["wrb.fr","jQ1olc",null,null,null,[3],"generic"]]')